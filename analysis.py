@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Análisis de gramáticas BNF
+Calcula anulables, FIRST, FOLLOW, recursión izquierda (directa e indirecta)
+y reglas inalcanzables o improductivas.
+
+Los símbolos se numeran (terminales 0..T-1, no terminales T..T+N-1) y los
+conjuntos son enteros usados como bitsets; los puntos fijos se calculan con
+listas de trabajo, de modo que cada cambio solo reprocesa lo que depende de él.
+Las marcas por no terminal (anulable, alcanzable...) se calculan en un
+bytearray y se pasan a bitset al final: con decenas de miles de no
+terminales, consultar o activar un bit de un entero copia el entero entero.
+
+    python3 analysis.py grammar_bminor_plus.txt
+"""
+
+import sys
+import time
+
+from bnf import load_grammar
+
+END = '$'
+
+def bits(mask):
+    """Índices de los bits activos de un entero"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+def to_mask(flags):
+    """Bitset de un bytearray de marcas 0/1 (bit i = flags[i])"""
+    return int(flags.translate(_DIGITS)[::-1], 2) if flags else 0
+
+def propagate(sets, edges):
+    """Punto fijo sets[b] |= sets[a] para cada arista a -> b"""
+    work = [a for a in range(len(sets)) if sets[a] and edges[a]]
+    queued = set(work)
+    while work:
+        a = work.pop()
+        queued.discard(a)
+        value = sets[a]
+        for b in edges[a]:
+            merged = sets[b] | value
+            if merged != sets[b]:
+                sets[b] = merged
+                if b not in queued:
+                    queued.add(b)
+                    work.append(b)
+    return sets
+
+class Analysis:
+    """Resultado del análisis. Los conjuntos de no terminales son bitsets
+    indexados por posición en 'nonterminals'; FIRST y FOLLOW son bitsets
+    sobre 'terminals' (el último terminal es el fin de entrada '$')."""
+    __slots__ = ('grammar', 'terminals', 'nonterminals', 'productions', 'undefined',
+                 'nullable', 'first', 'follow', 'direct_left', 'left_cycles',
+                 'unreachable', 'unproductive', '_nullable')
+
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self._encode()
+        self._nullable_and_productive()
+        self._reachable()
+        self._first()
+        self._follow()
+        self._left_recursion()
+
+    # --------------------------------------------------------
+    # Codificación
+    # --------------------------------------------------------
+
+    def _encode(self):
+        g = self.grammar
+        self.terminals = sorted(g.terminals) + [END]
+        term_id = {t: i for i, t in enumerate(self.terminals)}
+        nonterminals = list(g.rules)
+        nt_id = {n: i for i, n in enumerate(nonterminals)}
+        undefined = []
+        for alts in g.rules.values():
+            for alt in alts:
+                for s in alt:
+                    if s not in term_id and s not in nt_id:
+                        nt_id[s] = len(nonterminals)
+                        nonterminals.append(s)
+                        undefined.append(s)
+        self.nonterminals = nonterminals
+        self.undefined = undefined
+
+        # Símbolo codificado: terminal t -> t, no terminal n -> T + n
+        base = len(self.terminals)
+        code = term_id.copy()
+        code.update((name, base + i) for name, i in nt_id.items())
+        code = code.__getitem__
+        self.productions = [
+            (nt_id[name], tuple(map(code, alt)))
+            for name, alts in g.rules.items() for alt in alts
+        ]
+
+    # --------------------------------------------------------
+    # Anulables y productivos
+    # --------------------------------------------------------
+
+    def _counting_fixpoint(self, count, occurs):
+        """Marca el lado izquierdo de una producción cuando su contador
+        (símbolos aún pendientes) llega a cero; cada no terminal marcado
+        descuenta sus apariciones (occurs). Devuelve las marcas como bytearray."""
+        productions = self.productions
+        done = bytearray(len(self.nonterminals))
+        work = [productions[p][0] for p, n in enumerate(count) if n == 0]
+        while work:
+            a = work.pop()
+            if done[a]:
+                continue
+            done[a] = 1
+            for p in occurs[a]:
+                count[p] -= 1
+                if count[p] == 0:
+                    work.append(productions[p][0])
+        return done
+
+    def _nullable_and_productive(self):
+        base = len(self.terminals)
+        # Una sola pasada por las producciones para los dos puntos fijos
+        occurs = [[] for _ in self.nonterminals]
+        symbols = []
+        pending = []
+        for p, (lhs, rhs) in enumerate(self.productions):
+            n = 0
+            for s in rhs:
+                if s >= base:
+                    n += 1
+                    occurs[s - base].append(p)
+            symbols.append(n)
+            # Una producción con terminales no es anulable: su contador no
+            # llega a cero
+            pending.append(n if n == len(rhs) else n + 1)
+        # Anulable: todos los símbolos de alguna producción son anulables
+        self._nullable = self._counting_fixpoint(pending, occurs)
+        self.nullable = to_mask(self._nullable)
+        # Productivo: deriva alguna cadena de terminales
+        productive = to_mask(self._counting_fixpoint(symbols, occurs))
+        self.unproductive = ((1 << len(self.nonterminals)) - 1) & ~productive
+
+    def _reachable(self):
+        base = len(self.terminals)
+        by_lhs = [[] for _ in self.nonterminals]
+        for lhs, rhs in self.productions:
+            by_lhs[lhs].append(rhs)
+        seen = bytearray(len(self.nonterminals))
+        seen[0] = 1
+        work = [0]
+        while work:
+            a = work.pop()
+            for rhs in by_lhs[a]:
+                for s in rhs:
+                    if s >= base and not seen[s - base]:
+                        seen[s - base] = 1
+                        work.append(s - base)
+        self.unreachable = ((1 << len(self.nonterminals)) - 1) & ~to_mask(seen)
+
+    # --------------------------------------------------------
+    # FIRST y FOLLOW
+    # --------------------------------------------------------
+
+    def _first(self):
+        base = len(self.terminals)
+        nullable = self._nullable
+        first = [0] * len(self.nonterminals)
+        # edges[b] = no terminales cuyo FIRST incluye FIRST(b)
+        edges = [set() for _ in self.nonterminals]
+        for lhs, rhs in self.productions:
+            for s in rhs:
+                if s < base:
+                    first[lhs] |= 1 << s
+                    break
+                edges[s - base].add(lhs)
+                if not nullable[s - base]:
+                    break
+        self.first = propagate(first, edges)
+
+    def first_of(self, symbols):
+        """FIRST de una secuencia codificada y si es anulable"""
+        base = len(self.terminals)
+        result = 0
+        for s in symbols:
+            if s < base:
+                return result | 1 << s, False
+            result |= self.first[s - base]
+            if not self._nullable[s - base]:
+                return result, False
+        return result, True
+
+    def _follow(self):
+        base = len(self.terminals)
+        nullable = self._nullable
+        first = self.first
+        follow = [0] * len(self.nonterminals)
+        follow[0] = 1 << (base - 1)          # FOLLOW(inicio) contiene '$'
+        edges = [set() for _ in self.nonterminals]
+        for lhs, rhs in self.productions:
+            # Recorrido de derecha a izquierda: FIRST del sufijo y si es anulable
+            suffix = 0
+            suffix_nullable = True
+            for s in reversed(rhs):
+                if s < base:
+                    suffix = 1 << s
+                    suffix_nullable = False
+                    continue
+                n = s - base
+                follow[n] |= suffix
+                if suffix_nullable and n != lhs:
+                    edges[lhs].add(n)
+                if nullable[n]:
+                    suffix |= first[n]
+                else:
+                    suffix = first[n]
+                    suffix_nullable = False
+        self.follow = propagate(follow, edges)
+
+    # --------------------------------------------------------
+    # Recursión izquierda
+    # --------------------------------------------------------
+
+    def _left_recursion(self):
+        base = len(self.terminals)
+        nullable = self._nullable
+        # a -> b si b puede aparecer en la posición más a la izquierda de a
+        edges = [[] for _ in self.nonterminals]
+        direct = bytearray(len(self.nonterminals))
+        for lhs, rhs in self.productions:
+            for s in rhs:
+                if s < base:
+                    break
+                n = s - base
+                if n == lhs:
+                    direct[lhs] = 1
+                elif n not in edges[lhs]:
+                    edges[lhs].append(n)
+                if not nullable[n]:
+                    break
+        self.direct_left = to_mask(direct)
+        # Ciclos: componentes fuertemente conexos con más de un no terminal
+        self.left_cycles = [scc for scc in _tarjan(edges) if len(scc) > 1]
+
+    @property
+    def left_recursive(self):
+        mask = self.direct_left
+        for scc in self.left_cycles:
+            for n in scc:
+                mask |= 1 << n
+        return mask
+
+    # --------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------
+
+    def names(self, mask, terminals=False):
+        table = self.terminals if terminals else self.nonterminals
+        return [table[i] for i in bits(mask)]
+
+def _tarjan(edges):
+    """Componentes fuertemente conexos (Tarjan iterativo, sin recursión)"""
+    index = [-1] * len(edges)
+    low = [0] * len(edges)
+    on_stack = [False] * len(edges)
+    stack = []
+    result = []
+    counter = 0
+    for root in range(len(edges)):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            else:
+                low[v] = min(low[v], low[edges[v][i - 1]])
+            while i < len(edges[v]):
+                w = edges[v][i]
+                i += 1
+                if index[w] == -1:
+                    work.append((v, i))
+                    work.append((w, 0))
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            else:
+                if low[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        scc.append(w)
+                        if w == v:
+                            break
+                    result.append(scc[::-1])
+    return result
+
+def analyze(grammar):
+    return Analysis(grammar)
+
+def report(a):
+    """Informe legible del análisis"""
+    lines = []
+    n = len(a.nonterminals)
+    lines.append(f"{n} no terminales, {len(a.terminals) - 1} terminales, {len(a.productions)} producciones")
+
+    def section(title, items):
+        lines.append(f"\n{title} ({len(items)}):")
+        lines.extend(f"  {item}" for item in items or ["(ninguno)"])
+
+    section("Símbolos sin definir", a.undefined)
+    section("Anulables", a.names(a.nullable))
+    section("Inalcanzables desde " + a.nonterminals[0], a.names(a.unreachable))
+    section("Improductivos", a.names(a.unproductive))
+    section("Recursión izquierda directa", a.names(a.direct_left))
+    section("Recursión izquierda indirecta (ciclos)",
+            [" -> ".join(a.nonterminals[i] for i in scc) for scc in a.left_cycles])
+
+    lines.append("\nFIRST / FOLLOW:")
+    width = max((len(name) for name in a.nonterminals), default=0)
+    for i, name in enumerate(a.nonterminals):
+        first = " ".join(a.names(a.first[i], terminals=True))
+        follow = " ".join(a.names(a.follow[i], terminals=True))
+        eps = " ε" if a.nullable >> i & 1 else ""
+        lines.append(f"  {name:<{width}}  FIRST {{{first}{eps}}}  FOLLOW {{{follow}}}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Análisis de una gramática BNF")
+    parser.add_argument('grammar', nargs='?', default='grammar_bminor_plus.txt',
+                        help="archivo de la gramática (por defecto grammar_bminor_plus.txt)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    grammar = load_grammar(args.grammar)
+    t1 = time.perf_counter()
+    a = analyze(grammar)
+    t2 = time.perf_counter()
+    print(report(a))
+    print(f"\n⏱  lectura {(t1 - t0) * 1000:.1f} ms, análisis {(t2 - t1) * 1000:.1f} ms")
+    return 1 if a.undefined or a.unproductive else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de railroad.py
+Construye y renderiza gramáticas sintéticas (anchura, profundidad, longitud de
+secuencia y número de reglas controlados) y el conjunto real de B-Minor+.
+
+    python3 benchmark.py --save bench.json             # medir y guardar
+    python3 benchmark.py --compare bench.json          # comparar con una línea base
+    python3 benchmark.py --check                       # salida y pickle frente a la versión recursiva
+"""
+
+import argparse
+import gc
+import json
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+
+from railroad import Component, Diagram, T, N, Seq, Ch, Opt, ZM
+
+# ============================================================
+# GRAMÁTICAS SINTÉTICAS
+# ============================================================
+
+def synthetic_tree(rule, breadth, depth, length):
+    """Árbol con 'breadth' alternativas por Choice, 'depth' niveles de
+    Optional/ZeroOrMore anidados y secuencias de 'length' símbolos.
+    Las etiquetas incluyen el número de regla para que los nodos de reglas
+    distintas no se compartan."""
+    def leaves(prefix):
+        return [T(f'{prefix}{i}') if i % 2 else N(f'{prefix}{i}') for i in range(length)]
+
+    node = Seq(*leaves(f'r{rule}_0_'))
+    for level in range(1, depth + 1):
+        wrap = Opt if level % 2 else ZM
+        alts = [Seq(*leaves(f'r{rule}_{level}_{b}_'), wrap(node)) for b in range(breadth - 1)]
+        node = Ch(wrap(node), *alts) if alts else wrap(node)
+    return node
+
+def synthetic_rules(rules, breadth, depth, length):
+    """{nombre: función que construye el diagrama} como el registro de generate_diagrams"""
+    return {f'r{i}': (lambda i=i: Diagram(synthetic_tree(i, breadth, depth, length)))
+            for i in range(rules)}
+
+def bminor_rules():
+    from generate_diagrams import diagrams
+    return diagrams
+
+# nombre -> función que devuelve el registro de reglas
+CASES = {
+    'bminor': bminor_rules,
+    'wide': lambda: synthetic_rules(rules=50, breadth=32, depth=1, length=4),
+    'deep': lambda: synthetic_rules(rules=20, breadth=1, depth=150, length=2),
+    'long': lambda: synthetic_rules(rules=50, breadth=1, depth=0, length=200),
+    'nested': lambda: synthetic_rules(rules=20, breadth=3, depth=5, length=3),
+    'many': lambda: synthetic_rules(rules=2000, breadth=3, depth=2, length=4),
+    # Anidamiento muy por encima del límite de recursión de Python
+    'abyss': lambda: synthetic_rules(rules=1, breadth=1, depth=30000, length=1),
+}
+
+# ============================================================
+# MEDICIÓN
+# ============================================================
+
+def _build(rules):
+    return [factory() for factory in rules.values()]
+
+def _render(built, minify):
+    return sum(len(d.to_svg(minify=minify)) for d in built)
+
+def measure(rules, repeat=3, minify=False):
+    """Tiempo de construcción y de to_svg (mínimo de 'repeat'), bytes y pico de memoria"""
+    build_s = render_s = float('inf')
+    size = 0
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        built = _build(rules)
+        t1 = time.perf_counter()
+        size = _render(built, minify)
+        t2 = time.perf_counter()
+        build_s = min(build_s, t1 - t0)
+        render_s = min(render_s, t2 - t1)
+        del built
+
+    # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+    gc.collect()
+    tracemalloc.start()
+    built = _build(rules)
+    _render(built, minify)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del built
+
+    return {
+        'rules': len(rules),
+        'build_ms': round(build_s * 1000, 3),
+        'render_ms': round(render_s * 1000, 3),
+        'bytes': size,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+def run(cases, repeat=3, minify=False):
+    results = {}
+    for name in cases:
+        results[name] = measure(CASES[name](), repeat, minify)
+        r = results[name]
+        print(f"  {name:<8} {r['rules']:>5} reglas  construcción {r['build_ms']:>9.2f} ms  "
+              f"to_svg {r['render_ms']:>9.2f} ms  {r['bytes']:>10} bytes  pico {r['peak_kib']:>9.1f} KiB")
+    return {
+        'python': platform.python_version(),
+        'minify': minify,
+        'cases': results,
+    }
+
+def compare(current, baseline, threshold, min_ms=1.0):
+    """Lista de regresiones frente a una línea base guardada. Los tiempos
+    cuentan solo si además empeoran más de min_ms (ruido en casos pequeños)"""
+    problems = []
+    for name, now in current['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if before is None:
+            continue
+        for key in ('build_ms', 'render_ms', 'peak_kib'):
+            slack = min_ms if key.endswith('_ms') else 0
+            if before[key] > 0 and now[key] > before[key] * threshold and now[key] - before[key] > slack:
+                problems.append(f"{name}.{key}: {before[key]} -> {now[key]} "
+                                f"(x{now[key] / before[key]:.2f})")
+        if now['bytes'] != before['bytes']:
+            problems.append(f"{name}.bytes: {before['bytes']} -> {now['bytes']} (la salida cambió)")
+    return problems
+
+# ============================================================
+# COMPROBACIÓN
+# ============================================================
+
+def _write_recursive(self, out, x, y, ctx=None):
+    """Component.write_svg como era antes de la pila explícita: cada hijo
+    se escribe con una llamada recursiva"""
+    for child, child_x, child_y in self._steps(out, x, y, ctx):
+        child.write_svg(out, child_x, child_y, ctx)
+
+def _recursive_svg(diagram, minify):
+    iterative = Component.write_svg
+    Component.write_svg = _write_recursive
+    try:
+        return diagram.to_svg(minify=minify)
+    finally:
+        Component.write_svg = iterative
+
+def _round_trip(diagram, minify):
+    """None si el diagrama sobrevive a pickle con la misma huella y el mismo SVG"""
+    copy = pickle.loads(pickle.dumps(diagram))
+    if copy.digest() != diagram.digest():
+        return "la huella cambió tras pickle"
+    if copy.to_svg(minify=minify) != diagram.to_svg(minify=minify):
+        return "el SVG cambió tras pickle"
+    return None
+
+def check(deep=30000):
+    """Lista de problemas: salida distinta de la del escritor recursivo en
+    B-Minor+ y los casos sintéticos poco profundos, diagramas que no
+    sobreviven a pickle o un RecursionError en un árbol de 'deep' niveles"""
+    problems = []
+    # 'many' repite 2000 veces la forma de 'nested' con otras etiquetas
+    shallow = {name: factory for name, factory in CASES.items() if name not in ('abyss', 'many')}
+    for case, factory in shallow.items():
+        for rule, build in factory().items():
+            diagram = build()
+            for minify in (False, True):
+                mode = ' (minify)' if minify else ''
+                if diagram.to_svg(minify=minify) != _recursive_svg(diagram, minify):
+                    problems.append(f"{case}/{rule}{mode}: distinto del escritor recursivo")
+                error = _round_trip(diagram, minify)
+                if error:
+                    problems.append(f"{case}/{rule}{mode}: {error}")
+
+    # El árbol profundo supera de sobra el límite de recursión: el escritor
+    # recursivo no puede servir de referencia, basta con que no falle
+    diagram = synthetic_rules(rules=1, breadth=1, depth=deep, length=1)['r0']()
+    for minify in (False, True):
+        mode = ' (minify)' if minify else ''
+        try:
+            diagram.to_svg(minify=minify)
+            error = _round_trip(diagram, minify)
+        except RecursionError:
+            error = "RecursionError"
+        if error:
+            problems.append(f"{deep} niveles{mode}: {error}")
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de construcción y renderizado de railroad.py")
+    parser.add_argument('cases', nargs='*', metavar='CASO',
+                        help=f"casos a ejecutar (por defecto todos: {', '.join(CASES)})")
+    parser.add_argument('-n', '--repeat', type=int, default=3,
+                        help="repeticiones por caso; se toma el mejor tiempo")
+    parser.add_argument('--minify', action='store_true', help="medir el modo minify")
+    parser.add_argument('--save', metavar='JSON', help="guardar los resultados")
+    parser.add_argument('--compare', metavar='JSON', help="comparar con una línea base guardada")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="factor a partir del cual un tiempo o pico de memoria es regresión")
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help="diferencia mínima en ms para considerar regresión un tiempo")
+    parser.add_argument('--check', action='store_true',
+                        help="comparar la salida con el escritor recursivo y comprobar pickle y árboles profundos")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"casos desconocidos: {', '.join(unknown)}")
+
+    if args.check:
+        problems = check()
+        if problems:
+            print(f"❌ {len(problems)} problemas:")
+            for problem in problems[:10]:
+                print(f"  {problem}")
+            return 1
+        print("✅ Salida idéntica al escritor recursivo, pickle sin cambios y 30000 niveles sin RecursionError")
+        return 0
+
+    print("Benchmarks de railroad.py")
+    results = run(args.cases or list(CASES), args.repeat, args.minify)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print(f"\n✅ Resultados guardados en {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.threshold, args.min_ms)
+        if problems:
+            print(f"\n❌ {len(problems)} regresiones frente a {args.compare}:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print(f"\n✅ Sin regresiones frente a {args.compare}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Lector de gramáticas BNF
+Lee el formato de grammar_bminor_plus.txt (reglas ::=, alternativas |,
+terminales entre comillas y /* epsilon */) y construye railroad diagrams
+"""
+
+import re
+from railroad import Diagram, Sequence, T, N, Seq, Ch, Opt, ZM
+
+# Etiquetas que se muestran en los diagramas para los tokens con nombre
+TOKEN_LABELS = {
+    'LOR': '||',
+    'LAND': '&&',
+    'EQ': '==',
+    'NE': '!=',
+    'LT': '<',
+    'LE': '<=',
+    'GT': '>',
+    'GE': '>=',
+    'NOT': '!',
+    'INC': '++',
+    'DEC': '--',
+}
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>/\*.*?\*/)
+  | (?P<open_comment>/\*)
+  | '(?P<term>[^'\n]+)'
+  | (?P<rule>[A-Za-z_]\w*)\s*::=
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<bar>\|)
+  | (?P<error>.)
+""", re.S | re.X)
+
+class GrammarError(ValueError):
+    pass
+
+class Grammar:
+    """Reglas en orden de aparición: nombre -> lista de alternativas (tuplas de símbolos)"""
+    __slots__ = ('rules', 'terminals')
+
+    def __init__(self, rules, terminals):
+        self.rules = rules
+        self.terminals = terminals
+
+    @property
+    def start(self):
+        return next(iter(self.rules))
+
+    def is_terminal(self, symbol):
+        return symbol in self.terminals
+
+def _error(text, pos, msg):
+    line = text.count('\n', 0, pos) + 1
+    return GrammarError(f"línea {line}: {msg}")
+
+def parse_grammar(text):
+    """Analiza el texto de la gramática en una sola pasada"""
+    rules = {}
+    terminals = set()
+    alts = None
+    alt = None
+    for m in _TOKEN.finditer(text):
+        kind = m.lastgroup
+        if kind == 'ws' or kind == 'comment':
+            continue
+        if kind == 'rule':
+            name = m.group('rule')
+            if name in rules:
+                raise _error(text, m.start(), f"regla '{name}' definida dos veces")
+            alt = []
+            alts = rules[name] = [alt]
+        elif kind == 'bar':
+            if alts is None:
+                raise _error(text, m.start(), "'|' fuera de una regla")
+            alt = []
+            alts.append(alt)
+        elif kind == 'term' or kind == 'name':
+            if alt is None:
+                raise _error(text, m.start(), f"símbolo '{m.group(kind)}' fuera de una regla")
+            if kind == 'term':
+                terminals.add(m.group('term'))
+            alt.append(m.group(kind))
+        elif kind == 'open_comment':
+            raise _error(text, m.start(), "comentario sin cerrar")
+        else:
+            raise _error(text, m.start(), f"carácter inesperado {m.group()!r}")
+
+    clash = terminals & rules.keys()
+    if clash:
+        raise GrammarError(f"símbolos usados como terminal y como regla: {', '.join(sorted(clash))}")
+    return Grammar({name: [tuple(a) for a in alts] for name, alts in rules.items()}, terminals)
+
+def load_grammar(path):
+    with open(path, encoding='utf-8') as f:
+        return parse_grammar(f.read())
+
+# ============================================================
+# CONVERSIÓN A DIAGRAMAS
+# ============================================================
+
+def _symbol(grammar, symbol):
+    if grammar.is_terminal(symbol):
+        return T(TOKEN_LABELS.get(symbol, symbol))
+    return N(symbol)
+
+def _sequence(grammar, symbols):
+    items = [_symbol(grammar, s) for s in symbols]
+    if len(items) == 1:
+        return items[0]
+    return Seq(*items)
+
+def _choice(grammar, alts):
+    """Alternativas -> componente (None si solo queda epsilon)"""
+    nonempty = [a for a in alts if a]
+    if not nonempty:
+        return None
+    if len(nonempty) == 1:
+        item = _sequence(grammar, nonempty[0])
+    else:
+        item = _factored(grammar, nonempty)
+        if item is None:
+            item = Ch(*[_sequence(grammar, a) for a in nonempty])
+    if len(nonempty) < len(alts):
+        return Opt(item)
+    return item
+
+def _factored(grammar, alts):
+    """Alternativas de igual longitud que difieren en una sola posición:
+    'a' op1 'b' | 'a' op2 'b'  ->  'a' (op1 | op2) 'b'"""
+    size = len(alts[0])
+    if size < 2 or any(len(a) != size for a in alts):
+        return None
+    diff = [i for i in range(size) if len({a[i] for a in alts}) > 1]
+    if len(diff) != 1:
+        return None
+    i = diff[0]
+    first = alts[0]
+    ops = Ch(*[_symbol(grammar, a[i]) for a in alts])
+    items = [_symbol(grammar, s) for s in first[:i]] + [ops] + [_symbol(grammar, s) for s in first[i + 1:]]
+    return Seq(*items)
+
+def _join(*parts):
+    items = []
+    for p in parts:
+        if isinstance(p, Sequence):
+            items.extend(p.items)
+        elif p is not None:
+            items.append(p)
+    if len(items) == 1:
+        return items[0]
+    return Seq(*items)
+
+def compile_rule(grammar, name):
+    """Componente para una regla. La recursión izquierda (A ::= A x | y) se
+    dibuja como y (x)* y la recursión derecha (A ::= x A | y) como (x)* y"""
+    alts = grammar.rules[name]
+    left = []
+    right = []
+    base = []
+    for alt in alts:
+        if alt == (name,):
+            # A ::= A no aporta nada al lenguaje
+            continue
+        if name not in alt:
+            base.append(alt)
+        elif alt[0] == name and name not in alt[1:]:
+            left.append(alt[1:])
+        elif alt[-1] == name and name not in alt[:-1]:
+            right.append(alt[:-1])
+        else:
+            # Recursión en medio de la regla: se dibuja tal cual
+            left = right = None
+            break
+
+    if left is not None and base and (not left or not right):
+        if left:
+            return _join(_choice(grammar, base), ZM(_choice(grammar, left)))
+        if right:
+            return _join(ZM(_choice(grammar, right)), _choice(grammar, base))
+
+    item = _choice(grammar, alts)
+    if item is None:
+        return T("ε")
+    return item
+
+def compile_grammar(grammar):
+    """Diagramas de todas las reglas, en el orden del archivo"""
+    return {name: Diagram(compile_rule(grammar, name)) for name in grammar.rules}
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Generador de programas B-Minor+ aleatorios
+Deriva programas al azar desde grammar_bminor_plus.txt (prog, class_decl,
+stmt anidados, la cadena completa de precedencia...) para tener corpus con
+que cargar el lexer, los analizadores y las herramientas de diagramas.
+
+- Cada no terminal conoce la longitud mínima de sus derivaciones (en
+  tokens) y el texto más corto que deriva. Una derivación recibe un
+  presupuesto de tokens: solo se eligen alternativas que caben y lo que
+  sobra se reparte al azar entre los hijos. Sin margen se copia el texto
+  más corto de una vez, así que siempre termina y nunca pasa del tamaño.
+- Los subárboles con poco presupuesto se toman de un pequeño depósito por
+  (regla, presupuesto) que se llena al vuelo: la mayor parte de los tokens
+  de un programa están en subárboles pequeños.
+- La salida se produce por bloques con semilla propia (semilla, número de
+  bloque): el resultado es el mismo con uno o varios procesos.
+
+    python3 fuzz.py --bytes 100M -o corpus.bminor           # 100 MB
+    python3 fuzz.py --count 5 --size 300 --seed 7           # 5 programas por stdout
+    python3 fuzz.py --start class_decl --count 3
+    python3 fuzz.py --bytes 1G -j 8 -o /tmp/corpus.bminor   # 8 procesos
+    python3 fuzz.py --check 500                             # lexer + lalr sobre 500 programas
+"""
+
+import random
+import sys
+import time
+from bisect import bisect_right
+
+from bnf import load_grammar
+from lexer import KINDS, KEYWORDS, OPERATORS
+
+# Texto de los terminales con más de una forma posible
+VARIANTS = {
+    'ID': ('x', 'y', 'i', 'n', 'count', 'total', 'node', 'value', 'tmp', 'limit', 'a1', 'buf'),
+    'INTEGER_LITERAL': ('0', '1', '2', '7', '42', '100', '65535'),
+    'FLOAT_LITERAL': ('0.5', '2.5', '3.14', '1.0e-3', '6.02e23'),
+    'CHAR_LITERAL': ("'a'", "'z'", "'\\n'", "'0'"),
+    'STRING_LITERAL': ('"hola"', '"x = "', '"\\t"', '""'),
+}
+
+# Terminales tras los que se corta la línea
+_NEWLINE = {';', '{', '}'}
+
+# Subárboles guardados por (regla, presupuesto) y presupuesto máximo de los
+# que se guardan: más grande, más rápido y menos variado
+POOL_SIZE = 32
+POOL_BUDGET = 64
+
+# Tamaño de los bloques de salida (cada uno con su semilla)
+CHUNK_BYTES = 1 << 20
+
+def _spelling():
+    """Terminal -> texto fuente (las palabras clave y operadores del lexer)"""
+    spelling = {KINDS[kind]: text.decode() for text, kind in KEYWORDS.items()}
+    spelling.update((KINDS[kind], text.decode()) for text, kind in OPERATORS.items())
+    spelling['EOF'] = ''
+    return spelling
+
+def _parse_size(text):
+    """'100M', '2G', '512k' o un número de bytes"""
+    units = {'k': 10 ** 3, 'm': 10 ** 6, 'g': 10 ** 9}
+    text = text.strip()
+    scale = units.get(text[-1:].lower())
+    return int(float(text[:-1] if scale else text) * (scale or 1))
+
+class Generator:
+    """Tablas precalculadas de una gramática para derivar al azar.
+
+    Los símbolos de las alternativas se guardan ya codificados: bytes para
+    un terminal de texto fijo, tupla de bytes para uno con variantes, entero
+    para un no terminal."""
+    __slots__ = ('grammar', 'seed', 'names', 'index', 'minlen', 'height', 'alts', 'pool_size', 'pool_budget',
+                 '_pools', '_choices')
+
+    def __init__(self, grammar, seed=0, pool_size=POOL_SIZE, pool_budget=POOL_BUDGET):
+        self.grammar = grammar
+        self.seed = seed
+        self.names = list(grammar.rules)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.pool_size = pool_size
+        self.pool_budget = pool_budget
+        self._pools = {}
+        self._choices = {}
+        spelling = _spelling()
+        texts = {}
+        for terminal in grammar.terminals:
+            end = b'\n' if terminal in _NEWLINE else b' '
+            if terminal in VARIANTS:
+                texts[terminal] = tuple(v.encode() + end for v in VARIANTS[terminal])
+            else:
+                text = spelling.get(terminal, terminal)
+                texts[terminal] = text.encode() + end if text else b''
+
+        shortest = self._minimum_lengths()
+        longest = self._maximum_lengths()
+        self.minlen = [shortest[name][0] for name in self.names]
+        self.height = [shortest[name][1] for name in self.names]
+        # Cada alternativa: (tokens mínimos, tokens máximos, altura de su
+        # derivación más corta, símbolos codificados, posiciones de los no
+        # terminales, posiciones de los que pueden crecer)
+        self.alts = []
+        for name in self.names:
+            entries = []
+            for alt in grammar.rules[name]:
+                cost, height = self._measure(alt, shortest)
+                reach = self._measure(alt, longest)[0]
+                items = tuple(texts[s] if grammar.is_terminal(s) else self.index[s] for s in alt)
+                children = tuple(i for i, s in enumerate(alt) if not grammar.is_terminal(s))
+                growable = tuple(i for i in children if longest[alt[i]][0] > shortest[alt[i]][0])
+                entries.append((cost, reach, height, items, children, growable))
+            self.alts.append(entries)
+
+    def _measure(self, alt, lengths):
+        """(tokens, altura) de una alternativa con las longitudes dadas por regla"""
+        tokens = 0
+        height = 0
+        for s in alt:
+            if self.grammar.is_terminal(s):
+                tokens += s != 'EOF'
+            else:
+                tokens += lengths[s][0]
+                height = max(height, lengths[s][1])
+        return tokens, height + 1
+
+    def _minimum_lengths(self):
+        """Punto fijo: regla -> (tokens mínimos, altura mínima entre las
+        derivaciones de esa longitud)"""
+        grammar = self.grammar
+        inf = float('inf')
+        shortest = {name: (inf, inf) for name in grammar.rules}
+        changed = True
+        while changed:
+            changed = False
+            for name, alts in grammar.rules.items():
+                for alt in alts:
+                    measure = self._measure(alt, shortest)
+                    if measure < shortest[name]:
+                        shortest[name] = measure
+                        changed = True
+        empty = [name for name, (tokens, _) in shortest.items() if tokens == inf]
+        if empty:
+            raise ValueError(f"reglas sin derivaciones finitas: {', '.join(empty)}")
+        return shortest
+
+    def _maximum_lengths(self):
+        """Regla -> (tokens máximos, 0), infinito si puede crecer sin límite.
+        Bellman-Ford para el camino más largo: lo que sigue creciendo tras
+        una ronda por regla está en un ciclo que añade tokens."""
+        grammar = self.grammar
+        longest = {name: (0, 0) for name in grammar.rules}
+
+        def relax():
+            grown = set()
+            for name, alts in grammar.rules.items():
+                for alt in alts:
+                    tokens = self._measure(alt, longest)[0]
+                    if tokens > longest[name][0]:
+                        longest[name] = (tokens, 0)
+                        grown.add(name)
+            return grown
+
+        for _ in range(len(grammar.rules)):
+            if not relax():
+                return longest
+        grown = relax()
+        while grown:
+            for name in grown:
+                longest[name] = (float('inf'), 0)
+            grown = relax()
+        return longest
+
+    def _choose(self, key):
+        """Alternativas para (regla, presupuesto). Sin margen, las de
+        longitud y altura mínimas: sus no terminales tienen menos altura,
+        así que la derivación termina. Con margen, las que caben y pueden
+        gastarlo entero o, si no hay, las que caben."""
+        symbol, budget = key
+        alts = self.alts[symbol]
+        if budget <= self.minlen[symbol]:
+            minimum = (self.minlen[symbol], self.height[symbol])
+            choices = [entry for entry in alts if (entry[0], entry[2]) == minimum]
+        else:
+            fits = [entry for entry in alts if entry[0] <= budget]
+            choices = [entry for entry in fits if entry[1] >= budget] or fits
+        self._choices[key] = choices
+        return choices
+
+    # --------------------------------------------------------
+    # Derivación
+    # --------------------------------------------------------
+
+    def derive(self, rule, budget, random_, out, fresh=False):
+        """Añade a 'out' (lista de bytes) una derivación de 'rule' de como
+        mucho max(budget, mínimo de la regla) tokens. 'random_' es p.ej.
+        rng.random; con 'fresh' la raíz no se toma de un depósito."""
+        append = out.append
+        minlen = self.minlen
+        choices = self._choices
+        choose = self._choose
+        pools = self._pools
+        pool_size = self.pool_size
+        pool_budget = self.pool_budget
+        stack = [(rule, max(budget, minlen[rule]))]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            item = pop()
+            if type(item) is bytes:
+                append(item)
+                continue
+            if type(item[0]) is bytes:
+                append(item[int(random_() * len(item))])
+                continue
+            if pool_size and item[1] <= pool_budget and not fresh:
+                pool = pools.get(item)
+                if pool is None:
+                    pool = self._fill(item)
+                # Vacío si se está llenando (un ciclo de reglas unitarias):
+                # se deriva sin depósito
+                if pool:
+                    append(pool[int(random_() * pool_size)])
+                    continue
+            fresh = False
+            options = choices.get(item) or choose(item)
+            cost, _, _, items, children, growable = options[int(random_() * len(options))]
+            if not children:
+                for entry in reversed(items):
+                    push(entry)
+                continue
+            # El sobrante se reparte al azar entre los no terminales que
+            # pueden crecer; los demás reciben su mínimo
+            expanded = list(items)
+            for i in children:
+                expanded[i] = (items[i], minlen[items[i]])
+            spare = item[1] - cost
+            if spare > 0 and growable:
+                if len(growable) == 1:
+                    i = growable[0]
+                    expanded[i] = (items[i], minlen[items[i]] + spare)
+                else:
+                    weights = [random_() for _ in growable]
+                    scale = spare / (sum(weights) or 1)
+                    for i, weight in zip(growable, weights):
+                        expanded[i] = (items[i], minlen[items[i]] + int(weight * scale))
+            for entry in reversed(expanded):
+                push(entry)
+
+    def _fill(self, key):
+        """Llena de una vez el depósito de (regla, presupuesto) con su propio
+        generador aleatorio: el contenido depende solo de la semilla y no
+        del orden en que se piden los depósitos"""
+        pool = self._pools[key] = []
+        random_ = random.Random(f'{self.seed}:{key[0]}:{key[1]}').random
+        texts = []
+        for _ in range(self.pool_size):
+            parts = []
+            self.derive(key[0], key[1], random_, parts, fresh=True)
+            texts.append(b''.join(parts))
+        pool.extend(texts)
+        return pool
+
+    def program(self, rng, size, start=None):
+        """Texto (bytes) de una derivación de 'start' con como mucho 'size' tokens"""
+        out = []
+        self.derive(self.index[start or self.grammar.start], size, rng.random, out)
+        return b''.join(out)
+
+    def chunk(self, number, size, start=None, limit=CHUNK_BYTES, count=None):
+        """Bloque reproducible 'number' de la semilla: programas hasta
+        'limit' bytes o 'count' programas. Devuelve el texto y el offset
+        del final de cada programa."""
+        random_ = random.Random(f'{self.seed}:{number}').random
+        rule = self.index[start or self.grammar.start]
+        out = []
+        ends = []
+        total = 0
+        while total < limit and (count is None or len(ends) < count):
+            before = len(out)
+            self.derive(rule, size, random_, out)
+            out.append(b'\n')
+            total += sum(map(len, out[before:]))
+            ends.append(total)
+        return b''.join(out), ends
+
+# ============================================================
+# GENERACIÓN EN PARALELO
+# ============================================================
+
+_worker = None
+
+def _init_worker(grammar_path, seed, pool_size, pool_budget):
+    global _worker
+    _worker = Generator(load_grammar(grammar_path), seed, pool_size, pool_budget)
+
+def _work(args):
+    return _worker.chunk(*args)
+
+def generate(out, grammar_path='grammar_bminor_plus.txt', total_bytes=None, count=None, size=200,
+             seed=0, start=None, jobs=1, pool_size=POOL_SIZE, pool_budget=POOL_BUDGET, progress=None):
+    """Escribe programas en 'out' (binario) hasta 'total_bytes' bytes o
+    'count' programas; devuelve (bytes, programas). Los bloques se escriben
+    en orden, así que el resultado no depende de 'jobs'. Con total_bytes se
+    escribe al menos un programa aunque sea más largo que el objetivo."""
+    if total_bytes is None and count is None:
+        raise ValueError("hace falta total_bytes o count")
+    limit = CHUNK_BYTES if total_bytes is None else max(1, min(CHUNK_BYTES, total_bytes))
+
+    def task(number):
+        return number, size, start, limit, count
+
+    written = 0
+    programs = 0
+
+    def consume(data, ends):
+        """Escribe un bloque (recortado a programas completos); False al acabar"""
+        nonlocal written, programs
+        keep = len(ends)
+        if count is not None:
+            keep = min(keep, count - programs)
+        if total_bytes is not None:
+            keep = min(keep, max(bisect_right(ends, total_bytes - written), not programs))
+        if keep < len(ends):
+            data = data[:ends[keep - 1]] if keep else b''
+        out.write(data)
+        written += len(data)
+        programs += keep
+        if progress:
+            progress(written, programs)
+        return keep == len(ends) and (count is None or programs < count) and \
+            (total_bytes is None or written < total_bytes)
+
+    if jobs <= 1:
+        _init_worker(grammar_path, seed, pool_size, pool_budget)
+        number = 0
+        while consume(*_work(task(number))):
+            number += 1
+        return written, programs
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Ventana de bloques en curso: a lo sumo dos por proceso en memoria
+    initargs = (grammar_path, seed, pool_size, pool_budget)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=initargs) as pool:
+        pending = deque(pool.submit(_work, task(number)) for number in range(2 * jobs))
+        number = len(pending)
+        while consume(*pending.popleft().result()):
+            pending.append(pool.submit(_work, task(number)))
+            number += 1
+        for future in pending:
+            future.cancel()
+    return written, programs
+
+# ============================================================
+# COMPROBACIÓN
+# ============================================================
+
+def check(count, grammar_path='grammar_bminor_plus.txt', size=200, seed=0):
+    """Pasa 'count' programas por el lexer y las tablas LALR(1); devuelve
+    [(programa, error)] de los que fallan y el número de conflictos de las
+    tablas (un conflicto resuelto puede rechazar programas válidos). Cada
+    programa se prueba además con tokens sobrantes tras 'EOF', que las
+    tablas deben rechazar."""
+    import lalr
+    from lexer import LexError, kind_names, tokenize
+
+    grammar = load_grammar(grammar_path)
+    generator = Generator(grammar, seed)
+    _, tables, conflicts = lalr.build(grammar)
+    rng = random.Random(seed)
+    problems = []
+    for _ in range(count):
+        text = generator.program(rng, size)
+        try:
+            kinds = list(kind_names(tokenize(text)))
+            tables.parse(kinds)
+        except (LexError, lalr.ParseError) as e:
+            problems.append((text, e))
+            continue
+        extra = rng.choice((['EOF'], [kinds[0]], [';', ';'], kinds))
+        try:
+            tables.parse(kinds + extra)
+        except lalr.ParseError:
+            continue
+        problems.append((text, f"aceptado con {' '.join(extra[:5])} tras 'EOF'"))
+    return problems, len(conflicts)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generador de programas B-Minor+ aleatorios")
+    parser.add_argument('--grammar', default='grammar_bminor_plus.txt', metavar='ARCHIVO')
+    parser.add_argument('-o', '--output', metavar='ARCHIVO', help="archivo de salida (por defecto stdout)")
+    parser.add_argument('--bytes', type=_parse_size, metavar='TAMAÑO',
+                        help="tamaño total del corpus: 500k, 100M, 2G...")
+    parser.add_argument('--count', type=int, metavar='N', help="número de programas")
+    parser.add_argument('--size', type=int, default=200, metavar='TOKENS',
+                        help="tokens máximos por programa (por defecto 200)")
+    parser.add_argument('--seed', default='0', help="semilla (por defecto 0)")
+    parser.add_argument('--start', metavar='REGLA', help="regla inicial (por defecto la primera, prog)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N', help="procesos generadores")
+    parser.add_argument('--pool', type=int, default=POOL_SIZE, metavar='N',
+                        help=f"subárboles guardados por (regla, presupuesto); 0 los desactiva (por defecto {POOL_SIZE})")
+    parser.add_argument('--pool-budget', type=int, default=POOL_BUDGET, metavar='TOKENS',
+                        help=f"tamaño máximo de los subárboles guardados (por defecto {POOL_BUDGET})")
+    parser.add_argument('--check', type=int, metavar='N',
+                        help="generar N programas y pasarlos por lexer.py y lalr.py")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems, conflicts = check(args.check, args.grammar, args.size, args.seed)
+        for text, error in problems[:3]:
+            print(f"❌ {error}\n{text.decode()}\n")
+        print(f"{'✅' if not problems else '❌'} {args.check - len(problems)}/{args.check} programas aceptados")
+        if problems and conflicts:
+            print(f"   (las tablas LALR(1) tienen {conflicts} conflictos resueltos; ver lalr.py)")
+        return 1 if problems else 0
+    if args.bytes is None and args.count is None:
+        parser.error("indica --bytes o --count")
+    if args.start and args.start not in load_grammar(args.grammar).rules:
+        parser.error(f"regla desconocida: {args.start}")
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    report = args.output is not None
+    t0 = time.perf_counter()
+
+    def progress(written, programs):
+        elapsed = time.perf_counter() - t0
+        print(f"\r  {written / 1e6:10.1f} MB  {programs:>9} programas  "
+              f"{written / 1e6 / elapsed:6.1f} MB/s", end='', file=sys.stderr, flush=True)
+
+    try:
+        written, programs = generate(out, args.grammar, args.bytes, args.count, args.size, args.seed,
+                                     args.start, args.jobs, args.pool, args.pool_budget,
+                                     progress if report else None)
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    if not programs:
+        print(f"{chr(13) if report else ''}❌ no se generó ningún programa", file=sys.stderr)
+        return 1
+    print(f"{chr(13) if report else ''}✅ {written / 1e6:.1f} MB, {programs} programas en {elapsed:.2f} s: "
+          f"{written / 1e6 / elapsed:.1f} MB/s, {written / 1e9 / elapsed * 60:.2f} GB/min "
+          f"({args.jobs} proceso{'s' if args.jobs != 1 else ''})", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
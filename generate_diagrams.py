@@ -2,13 +2,23 @@
 """
 Generador de Railroad Diagrams para B-Minor+
 Genera diagramas de sintaxis para todas las reglas importantes de la gramática
+
+Uso como librería (sin escribir en disco):
+
+    from generate_diagrams import build_atlas
+    svgs = build_atlas()              # {'prog': b'<svg ...', ...}
+    bundle = build_bundle()           # un único SVG con todas las reglas
+    svgs = build_atlas(inline_rules(depth=3))   # reglas expandidas en línea
 """
 
+import hashlib
+import json
 import os
-from railroad import *
-
-# Crear directorio de salida
-os.makedirs('out/svg', exist_ok=True)
+import weakref
+from collections import Counter
+from layout import render as render_layout
+from railroad import (RENDERER_VERSION, Choice, Component, Diagram, Inlined, NonTerminal, Optional,
+                      Sequence, Terminal, ZeroOrMore, T, N, Seq, Ch, Opt, ZM, write_atlas)
 
 # ============================================================
 # PROGRAM
@@ -511,45 +521,970 @@ diagrams = {
     'type_func': d_type_func,
 }
 
-print("Generando railroad diagrams...")
-for name, func in diagrams.items():
-    diagram = func()
-    filename = f'out/svg/{name}.svg'
-    diagram.save(filename)
-    print(f"  ✓ {filename}")
-
-print(f"\n✅ {len(diagrams)} diagramas generados en out/svg/")
-
-# Generar índice en Markdown
-print("\nGenerando índice...")
-with open('out/index.md', 'w') as f:
-    f.write("# B-Minor+ Grammar - Railroad Diagrams\n\n")
-    f.write("## Program Structure\n\n")
-    f.write("### prog\n![[svg/prog.svg]]\n\n")
-    
-    f.write("## Declarations\n\n")
-    for name in ['decl_list', 'decl', 'decl_init', 'class_decl', 'class_body', 'class_member']:
-        f.write(f"### {name}\n![[svg/{name}.svg]]\n\n")
-    
-    f.write("## Statements\n\n")
-    stmt_rules = ['stmt', 'closed_stmt', 'open_stmt', 
-                  'if_stmt_closed', 'if_stmt_open',
-                  'for_stmt_closed', 'for_stmt_open',
-                  'while_stmt_closed', 'while_stmt_open',
-                  'simple_stmt', 'print_stmt', 'return_stmt', 'block_stmt']
-    for name in stmt_rules:
-        f.write(f"### {name}\n![[svg/{name}.svg]]\n\n")
-    
-    f.write("## Expressions\n\n")
-    expr_rules = ['expr', 'expr1', 'expr1_5', 'expr2', 'expr3', 'expr4', 
-                  'expr5', 'expr6', 'expr7', 'expr8', 'expr9',
-                  'group', 'lval', 'index', 'factor']
-    for name in expr_rules:
-        f.write(f"### {name}\n![[svg/{name}.svg]]\n\n")
-    
-    f.write("## Types\n\n")
-    for name in ['type_simple', 'type_array', 'type_array_sized', 'type_func']:
-        f.write(f"### {name}\n![[svg/{name}.svg]]\n\n")
+# ============================================================
+# RENDERIZADO EN MEMORIA
+# ============================================================
+
+# Secciones del índice. Las reglas que no aparecen aquí (p.ej. las que solo
+# existen en la gramática) se listan al final en "Other Rules".
+sections = [
+    ('Program Structure', ['prog']),
+    ('Declarations', ['decl_list', 'decl', 'decl_init', 'class_decl', 'class_body', 'class_member']),
+    ('Statements', ['stmt', 'closed_stmt', 'open_stmt',
+                    'if_stmt_closed', 'if_stmt_open',
+                    'for_stmt_closed', 'for_stmt_open',
+                    'while_stmt_closed', 'while_stmt_open',
+                    'simple_stmt', 'print_stmt', 'return_stmt', 'block_stmt']),
+    ('Expressions', ['expr', 'expr1', 'expr1_5', 'expr2', 'expr3', 'expr4',
+                     'expr5', 'expr6', 'expr7', 'expr8', 'expr9',
+                     'group', 'lval', 'index', 'factor']),
+    ('Types', ['type_simple', 'type_array', 'type_array_sized', 'type_func']),
+]
+
+# Notas de la página HTML: {regla: (subtítulo, etiqueta, (título, texto))}
+notes = {
+    'class_decl': ('', 'NUEVA', ('Extensión', 'Permite definir clases con miembros de datos y métodos.')),
+    'class_body': ('', 'NUEVA', None),
+    'class_member': ('', 'NUEVA', None),
+    'open_stmt': ('', '', ('Dangling-Else', 'La separación entre open_stmt y closed_stmt resuelve '
+                                            'la ambigüedad del dangling-else.')),
+    'while_stmt_closed': ('', 'NUEVA', ('Extensión', 'Bucle while con el mismo patrón open/closed que if y for.')),
+    'while_stmt_open': ('', 'NUEVA', None),
+    'expr1': ('Asignación', 'EXTENDIDA', ('Extensión', 'Operadores compuestos +=, -=, *=, /=')),
+    'expr1_5': ('Ternario', 'NUEVA', ('Extensión', 'Operador ternario condicional (? :)')),
+    'expr2': ('OR Lógico', '', None),
+    'expr3': ('AND Lógico', '', None),
+    'expr4': ('Comparación', '', None),
+    'expr5': ('Suma/Resta', '', None),
+    'expr6': ('Multiplicación/División', '', None),
+    'expr7': ('Exponenciación', '', None),
+    'expr8': ('Unarios', 'EXTENDIDA', ('Extensión', 'Pre-incremento (++expr) y pre-decremento (--expr)')),
+    'expr9': ('Postfijo', 'EXTENDIDA', ('Extensión', 'Acceso a miembros (.ID) para objetos')),
+    'group': ('', 'EXTENDIDA', ('Extensión', 'Operador NEW para crear instancias de clases')),
+    'lval': ('', 'EXTENDIDA', ('Extensión', 'Lvalues pueden incluir acceso a miembros (lval.ID)')),
+    'type_simple': ('', 'EXTENDIDA', ('Extensión', 'ID como tipo permite usar nombres de clases como tipos')),
+}
+
+# Recuadro al comienzo de una sección de la página HTML
+section_notes = {
+    'Expressions': ('Precedencia de Operadores (menor a mayor)', [
+        '1. Asignación: = += -= *= /= (asocia a la derecha)',
+        '2. Ternario: ?: (asocia a la derecha)',
+        '3. OR lógico: ||',
+        '4. AND lógico: &&',
+        '5. Comparación: == != < <= > >=',
+        '6. Suma/Resta: + -',
+        '7. Multiplicación/División: * / %',
+        '8. Exponenciación: ^',
+        '9. Unarios: - ! ++ -- (prefijo)',
+        '10. Postfijo: ++ -- . () []',
+    ]),
+}
+
+def get_diagram(rule):
+    """Acepta un Diagram ya construido o una función que lo construye (d_*)"""
+    if isinstance(rule, Diagram):
+        return rule
+    return rule()
+
+def render_svg(diagram, minify=False, links=None):
+    """SVG de un diagrama como bytes (se ejecuta también en los procesos hijos).
+    links: {regla: href} para enlazar las cajas NonTerminal"""
+    return diagram.to_svg(minify=minify, links=links).encode()
+
+def render_all(items, jobs=1, minify=False, links=None):
+    """Renderiza una lista de diagramas y devuelve los bytes en el mismo orden"""
+    if jobs <= 1 or len(items) <= 1:
+        return [render_svg(diagram, minify, links) for diagram in items]
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    # Los árboles se envían a los procesos hijos y estos devuelven los bytes;
+    # map() conserva el orden, así que la salida no depende de 'jobs'.
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(partial(render_svg, minify=minify, links=links), items, chunksize=chunksize))
+
+def build_atlas(rules=None, jobs=1, minify=False, links=None):
+    """Renderiza en memoria {nombre: bytes SVG}, sin tocar el disco.
+    rules: {nombre: Diagram o función d_*}; por defecto, 'diagrams'
+    links: {regla: href} de las cajas NonTerminal; por defecto, los mismos
+    enlaces que out/svg (svg_links). {} deja los diagramas sin enlaces."""
+    if rules is None:
+        rules = diagrams
+    if links is None:
+        links = svg_links(rules)
+    names = list(rules)
+    svgs = render_all([get_diagram(rules[name]) for name in names], jobs, minify, links)
+    return dict(zip(names, svgs))
+
+def build_bundle(rules=None, minify=False, links=None):
+    """Todas las reglas en un único SVG (bytes): cada caja distinta se define
+    una vez como <symbol> y cada regla se enlaza con atlas.svg#nombre"""
+    if rules is None:
+        rules = diagrams
+    buf = []
+    write_atlas(buf.append, [(name, get_diagram(rule)) for name, rule in rules.items()],
+                minify=minify, links=links)
+    return "".join(buf).encode()
+
+# ============================================================
+# EXPANSIÓN DE REGLAS
+# ============================================================
+
+def _references(root):
+    """Nombres de los NonTerminal de un árbol"""
+    found = set()
+    seen = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        if isinstance(node, NonTerminal):
+            found.add(node.text)
+        elif not node._leaf:
+            stack.extend(arg for arg in node.__reduce__()[1] if isinstance(arg, Component))
+    return found
+
+def _rebuild(root, replace):
+    """Copia del árbol con cada hoja sustituida por replace(hoja) -> (nodo, cajas).
+    Devuelve (nodo, cajas), donde 'cajas' es el número de hojas que se
+    dibujan. Postorden con pila explícita; los subárboles compartidos se
+    reconstruyen una sola vez."""
+    done = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        if node._leaf:
+            done[node] = replace(node)
+            stack.pop()
+            continue
+        cls, args = node.__reduce__()
+        pending = [arg for arg in args if isinstance(arg, Component) and arg not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        new_args = []
+        size = 0
+        for arg in args:
+            if isinstance(arg, Component):
+                child, boxes = done[arg]
+                new_args.append(child)
+                size += boxes
+            else:
+                new_args.append(arg)
+        done[node] = (cls(*new_args), size)
+    return done[root]
+
+def inline_rules(rules=None, depth=2, max_boxes=200):
+    """Reglas con sus NonTerminal expandidos en línea hasta 'depth' niveles.
+    Una referencia no se expande si la regla ya está en el camino
+    (recursión) o si su expansión dibujaría más de max_boxes cajas.
+
+    Cada expansión se memoriza por (regla, profundidad restante, reglas del
+    camino que alcanza), así que la misma regla expandida en muchos sitios
+    se construye una vez y, como los nodos están internados, es el mismo
+    Inlined: se mide una vez y se escribe una vez por documento (<use>)."""
+    if rules is None:
+        rules = diagrams
+    roots = {name: get_diagram(rule).root for name, rule in rules.items()}
+    refs = {name: _references(root) & roots.keys() for name, root in roots.items()}
+    reach = {}
+    for name in roots:
+        seen = set()
+        stack = [name]
+        while stack:
+            for other in refs[stack.pop()]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        reach[name] = seen
+    memo = {}
+
+    def expand(name, left, path):
+        """(árbol de 'name' con sus referencias expandidas, cajas)"""
+        key = (name, left, path & reach[name])
+        found = memo.get(key)
+        if found is None:
+            inner = path | {name}
+
+            def replace(leaf):
+                if isinstance(leaf, NonTerminal) and left > 0 and leaf.text in roots and leaf.text not in inner:
+                    item, boxes = expand(leaf.text, left - 1, inner)
+                    if boxes <= max_boxes:
+                        return Inlined(leaf.text, item), boxes
+                return leaf, 1
+
+            found = memo[key] = _rebuild(roots[name], replace)
+        return found
+
+    return {name: Diagram(expand(name, depth, frozenset())[0]) for name in roots}
+
+# ============================================================
+# FACTORIZACIÓN DE ALTERNATIVAS
+# ============================================================
+
+def _items(node):
+    """Elementos de una alternativa: los de una secuencia o el nodo solo"""
+    return node.items if isinstance(node, Sequence) else (node,)
+
+def _sequence(items):
+    return items[0] if len(items) == 1 else Sequence(*items)
+
+def _common_prefix(alts):
+    first = alts[0]
+    n = min(len(alt) for alt in alts)
+    i = 0
+    while i < n and all(alt[i] is first[i] for alt in alts):
+        i += 1
+    return first[:i]
+
+def _factor_side(alts, suffix):
+    """Agrupa las alternativas que empiezan (o acaban) por el mismo nodo y
+    saca lo común: a b | a c -> a (b | c). Cada grupo queda en el sitio de
+    su primera alternativa."""
+    groups = {}
+    for alt in alts:
+        groups.setdefault(alt[-1] if suffix else alt[0], []).append(alt)
+    merged = {}
+    for key, group in groups.items():
+        if len(group) == 1:
+            continue
+        if suffix:
+            common = _common_prefix([alt[::-1] for alt in group])[::-1]
+            rest = _factor_choice([alt[:len(alt) - len(common)] for alt in group])
+            candidate = _items(rest) + common
+        else:
+            common = _common_prefix(group)
+            rest = _factor_choice([alt[len(common):] for alt in group])
+            candidate = common + _items(rest)
+        # Sacar un nodo corto puede costar más Sequence y Choice de los que
+        # ahorra: solo se factoriza si el resultado tiene menos nodos
+        if _size(candidate) < sum(_size(alt) for alt in group):
+            merged[key] = candidate
+    result = []
+    for alt in alts:
+        key = alt[-1] if suffix else alt[0]
+        if key not in merged:
+            result.append(alt)
+        elif alt is groups[key][0]:
+            result.append(merged[key])
+    return result
+
+def _size(alt):
+    """Nodos que dibuja una alternativa (la Sequence cuenta si hay más de uno)"""
+    return sum(sum(tree_stats(item, _size_memo)[0].values()) for item in alt) + (len(alt) > 1)
+
+_size_memo = weakref.WeakKeyDictionary()
+
+def _factor_choice(alts):
+    """Componente para alternativas dadas como tuplas de nodos (() es la
+    secuencia vacía): sin repetidas, con los prefijos y sufijos comunes
+    sacados y la vacía convertida en Optional"""
+    alts = list(dict.fromkeys(alts))
+    empty = () in alts
+    alts = [alt for alt in alts if alt]
+    if not alts:
+        return T("ε")
+    if len(alts) > 1:
+        alts = _factor_side(alts, suffix=False)
+    if len(alts) > 1:
+        alts = _factor_side(alts, suffix=True)
+    alts = list(dict.fromkeys(alts))
+    item = _sequence(alts[0]) if len(alts) == 1 else Choice(*(_sequence(alt) for alt in alts))
+    return _optional(item) if empty else item
+
+def _optional(item):
+    # Opt(Opt x) = Opt x y Opt(x*) = x*
+    return item if isinstance(item, (Optional, ZeroOrMore)) else Optional(item)
+
+def _simplified(node, args):
+    """Nodo equivalente a type(node)(*args) con los hijos ya simplificados"""
+    if isinstance(node, Sequence):
+        items = tuple(item for arg in args for item in _items(arg))
+        return _sequence(items) if items else node
+    if isinstance(node, Choice):
+        alts = []
+        for arg in args:
+            if isinstance(arg, Choice):
+                alts.extend(_items(item) for item in arg.items)
+            elif isinstance(arg, Optional):
+                alts.extend((_items(arg.item), ()))
+            else:
+                alts.append(_items(arg))
+        return _factor_choice(alts)
+    if isinstance(node, Optional):
+        return _optional(args[0])
+    if isinstance(node, ZeroOrMore):
+        # (x?)* = x* y (x*)* = x*
+        item = args[0]
+        return item if isinstance(item, ZeroOrMore) else ZeroOrMore(item.item if isinstance(item, Optional) else item)
+    return type(node)(*args)
+
+def factor_tree(root):
+    """Árbol que acepta las mismas secuencias con menos nodos: saca los
+    prefijos y sufijos comunes de las alternativas de cada Choice, une los
+    Choice anidados, aplana las Sequence y quita las de un solo elemento.
+    Entra también en los Inlined. Postorden con pila explícita; los
+    subárboles compartidos se simplifican una sola vez."""
+    done = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node in done:
+            stack.pop()
+            continue
+        if isinstance(node, (Terminal, NonTerminal)):
+            done[node] = node
+            stack.pop()
+            continue
+        args = node.__reduce__()[1]
+        pending = [arg for arg in args if isinstance(arg, Component) and arg not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        done[node] = _simplified(node, tuple(done[arg] if isinstance(arg, Component) else arg for arg in args))
+    return done[root]
+
+def factor_rules(rules=None, savings=None, minify=False):
+    """Reglas con sus árboles factorizados (ver factor_tree). Si se pasa el
+    dict 'savings', se anotan para cada regla los nodos y bytes de SVG
+    antes y después."""
+    if rules is None:
+        rules = diagrams
+    memo = {}
+    factored = {}
+    for name, rule in rules.items():
+        diagram = get_diagram(rule)
+        factored[name] = Diagram(factor_tree(diagram.root))
+        if savings is not None:
+            savings[name] = {
+                'nodes': sum(tree_stats(diagram.root, memo)[0].values()),
+                'nodes_after': sum(tree_stats(factored[name].root, memo)[0].values()),
+                'bytes': len(render_svg(diagram, minify)),
+                'bytes_after': len(render_svg(factored[name], minify)),
+            }
+    return factored
+
+def print_savings(savings):
+    """Reglas que cambian al factorizar y total de nodos y bytes ahorrados"""
+    changed = [name for name, entry in savings.items() if entry['nodes_after'] != entry['nodes']]
+    print(f"\n✂️  Factorización: {len(changed)} de {len(savings)} reglas más pequeñas")
+    for name in sorted(changed, key=lambda name: savings[name]['nodes_after'] - savings[name]['nodes']):
+        entry = savings[name]
+        print(f"  {name:<22} nodos {entry['nodes']:>4} → {entry['nodes_after']:<4} "
+              f"bytes {entry['bytes']:>7} → {entry['bytes_after']}")
+    nodes = sum(entry['nodes'] for entry in savings.values())
+    nodes_after = sum(entry['nodes_after'] for entry in savings.values())
+    size = sum(entry['bytes'] for entry in savings.values())
+    size_after = sum(entry['bytes_after'] for entry in savings.values())
+    print(f"  {'total':<22} {nodes - nodes_after} nodos menos ({(nodes - nodes_after) / (nodes or 1):.0%}), "
+          f"{size - size_after} bytes menos ({(size - size_after) / (size or 1):.0%})")
+
+def _grouped(names):
+    """[(sección, reglas)] en el orden de 'sections'; las reglas que no
+    aparecen en ninguna van al final en 'Other Rules'"""
+    names = list(names)
+    present = set(names)
+    listed = set()
+    groups = []
+    for title, section in sections:
+        section = [name for name in section if name in present]
+        if section:
+            groups.append((title, section))
+            listed.update(section)
+    others = [name for name in names if name not in listed]
+    if others:
+        groups.append(('Other Rules', others))
+    return groups
+
+def index_markdown(names, assets=None):
+    """Índice de Obsidian para las reglas dadas, agrupadas por sección.
+    assets: {nombre: ruta} si los SVG no se llaman svg/<nombre>.svg"""
+    assets = assets or {}
+    index = ["# B-Minor+ Grammar - Railroad Diagrams\n\n"]
+    for title, section in _grouped(names):
+        index.append(f"## {title}\n\n")
+        for name in section:
+            index.append(f"### {name}\n![[{assets.get(name, f'svg/{name}.svg')}]]\n\n")
+    return "".join(index)
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.template.html')
+
+# Alto en píxeles de los diagramas que se incrustan en la página (la primera
+# pantalla); el resto se carga al acercarse con el scroll
+EAGER_PX = 900
+
+def index_html(rules, assets=None, eager_px=EAGER_PX, template=TEMPLATE, index=None):
+    """Atlas HTML de las reglas dadas, agrupadas por sección, sobre la
+    plantilla index.template.html. Los primeros diagramas (hasta eager_px de
+    alto) van incrustados como SVG; los demás son <object type="image/svg+xml">
+    con width y aspect-ratio, así el navegador reserva su hueco. La plantilla
+    les pone 'data' al acercarse al viewport; un <object>, a diferencia de un
+    <img>, deja activos los enlaces del SVG.
+    El índice de búsqueda (search_index) va dentro de la página, así que
+    buscar no necesita servidor.
+    assets: {nombre: ruta} si los SVG no se llaman svg/<nombre>.svg"""
+    from html import escape
+    assets = assets or {}
+    if index is None:
+        index = search_index(rules)
+    links = {name: f'#rule-{name}' for name in rules}
+    with open(template, encoding='utf-8') as f:
+        page = f.read()
+    nav = []
+    body = []
+    budget = eager_px
+    for title, section in _grouped(rules):
+        anchor = title.split()[0].lower()
+        nav.append(f'                <li><a href="#{anchor}">{escape(title.split()[0])}</a></li>\n')
+        body.append(f'            \n            <section id="{anchor}">\n'
+                    f'                <h2>{escape(title)}</h2>\n')
+        if title in section_notes:
+            heading, lines = section_notes[title]
+            lines = '<br>\n                    '.join(map(escape, lines))
+            body.append(f'                \n                <div class="info-box">\n'
+                        f'                    <strong>{escape(heading)}:</strong><br>\n'
+                        f'                    {lines}\n'
+                        f'                </div>\n')
+        for name in section:
+            diagram = get_diagram(rules[name])
+            subtitle, badge, note = notes.get(name, ('', '', None))
+            heading = f'<span class="rule-name">{escape(name)}</span>'
+            if subtitle:
+                heading += f' ({escape(subtitle)})'
+            if badge:
+                heading += f' <span class="extension-badge">{escape(badge)}</span>'
+            if budget > 0:
+                # Los estilos de un SVG incrustado valen para toda la página:
+                # basta con que los traiga el primero
+                figure = render_layout(diagram, 'svg', style=budget == eager_px, links=links)
+                budget -= diagram.height
+                rule_attrs = 'class="rule"'
+            else:
+                # 'auto' conserva el alto real una vez que la regla se ha mostrado
+                rule_attrs = f'class="rule lazy" style="contain-intrinsic-size: auto {round(diagram.height) + 120}px"'
+                src = escape(assets.get(name, f'svg/{name}.svg'))
+                width, height = round(diagram.width), round(diagram.height)
+                figure = (f'<object type="image/svg+xml" data-src="{src}" width="{width}" height="{height}" '
+                          f'style="aspect-ratio: {width} / {height}" aria-label="{escape(name)}"></object>'
+                          f'<noscript><img src="{src}" width="{width}" height="{height}" alt="{escape(name)}"></noscript>')
+            body.append(f'                \n                <div id="rule-{escape(name)}" {rule_attrs}>\n'
+                        f'                    <h3>{heading}</h3>\n'
+                        f'                    <div class="diagram-container">\n'
+                        f'                        {figure}\n'
+                        f'                    </div>\n')
+            if note:
+                body.append(f'                    <div class="info-box">\n'
+                            f'                        <strong>{escape(note[0])}:</strong> {escape(note[1])}\n'
+                            f'                    </div>\n')
+            body.append('                </div>\n')
+        body.append('            </section>\n')
+    # '</' no puede aparecer dentro de <script>
+    data = json.dumps(index, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    return (page.replace('<!-- NAV -->\n', ''.join(nav))
+                .replace('<!-- SECCIONES -->\n', ''.join(body))
+                .replace('<!-- INDICE -->', data))
+
+# ============================================================
+# ÍNDICE DE REFERENCIAS
+# ============================================================
+
+def cross_references(rules):
+    """Etiquetas que usa cada regla: {regla: {etiqueta: 'n' | 't'}}, con 'n'
+    para NonTerminal (o regla expandida) y 't' para Terminal. Un solo
+    recorrido en postorden para todas las reglas: los subárboles internados
+    que comparten varias reglas se visitan una sola vez."""
+    memo = {}
+    refs = {}
+    for name, rule in rules.items():
+        root = get_diagram(rule).root
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node in memo:
+                stack.pop()
+                continue
+            if isinstance(node, Terminal):
+                memo[node] = {node.text: 't'}
+            elif isinstance(node, NonTerminal):
+                memo[node] = {node.text: 'n'}
+            elif isinstance(node, Inlined):
+                memo[node] = {node.name: 'n'}
+            else:
+                children = [arg for arg in node.__reduce__()[1] if isinstance(arg, Component)]
+                pending = [child for child in children if child not in memo]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                labels = {}
+                for child in children:
+                    labels.update(memo[child])
+                memo[node] = labels
+            stack.pop()
+        refs[name] = memo[root]
+    return refs
+
+def search_index(rules, refs=None):
+    """Índice de búsqueda compacto (JSON) para el visor:
+    - labels: todas las etiquetas, ordenadas sin distinguir mayúsculas
+      (búsqueda por prefijo con bisección)
+    - kinds: un carácter por etiqueta: 'r' regla con diagrama, 'n' no
+      terminal sin diagrama, 't' terminal
+    - refs / uses: por etiqueta, índices de las etiquetas que usa (solo las
+      reglas) y de las reglas que la usan"""
+    if refs is None:
+        refs = cross_references(rules)
+    kinds = {}
+    for used in refs.values():
+        kinds.update(used)
+    kinds.update(dict.fromkeys(rules, 'r'))
+    labels = sorted(kinds, key=lambda label: (label.lower(), label))
+    ids = {label: i for i, label in enumerate(labels)}
+    forward = [[] for _ in labels]
+    uses = [[] for _ in labels]
+    for name, used in refs.items():
+        rule = ids[name]
+        forward[rule] = sorted(ids[label] for label in used)
+        for label in used:
+            uses[ids[label]].append(rule)
+    return {
+        'labels': labels,
+        'kinds': ''.join(kinds[label] for label in labels),
+        'refs': forward,
+        'uses': [sorted(users) for users in uses],
+    }
+
+# ============================================================
+# ESTADÍSTICAS POR REGLA
+# ============================================================
+
+# Un valor es atípico si supera este múltiplo de la mediana de su columna;
+# en los tiempos, además, por al menos OUTLIER_MIN_MS (ruido en reglas pequeñas)
+OUTLIER_FACTOR = 4
+OUTLIER_MIN_MS = 1.0
+
+def tree_stats(root, memo=None):
+    """(nodos por tipo de componente, profundidad máxima) del árbol tal como
+    se dibuja: un subárbol compartido cuenta cada vez que aparece. Postorden
+    con pila explícita; 'memo' se puede compartir entre reglas."""
+    if memo is None:
+        memo = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        children = [arg for arg in node.__reduce__()[1] if isinstance(arg, Component)]
+        pending = [child for child in children if child not in memo]
+        if pending:
+            stack.extend(pending)
+            continue
+        counts = Counter({type(node).__name__: 1})
+        depth = 0
+        for child in children:
+            child_counts, child_depth = memo[child]
+            counts.update(child_counts)
+            depth = max(depth, child_depth)
+        memo[node] = (counts, depth + 1)
+        stack.pop()
+    return memo[root]
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+def profile_rules(rules, minify=False, links=None):
+    """Mide cada regla: construcción del árbol (solo funciones d_*; los
+    Diagram ya construidos dan None), renderizado, nodos por tipo,
+    profundidad, bytes del SVG y pico de memoria del renderizado.
+    Los tiempos se toman sin tracemalloc; la memoria, en una segunda pasada."""
+    import time
+    import tracemalloc
+
+    report = {}
+    built = {}
+    memo = {}
+    for name, rule in rules.items():
+        t0 = time.perf_counter()
+        diagram = get_diagram(rule)
+        t1 = time.perf_counter()
+        data = render_svg(diagram, minify, links)
+        t2 = time.perf_counter()
+        counts, depth = tree_stats(diagram.root, memo)
+        built[name] = diagram
+        report[name] = {
+            'build_ms': None if isinstance(rule, Diagram) else round((t1 - t0) * 1000, 3),
+            'render_ms': round((t2 - t1) * 1000, 3),
+            'bytes': len(data),
+            'nodes': sum(counts.values()),
+            'depth': depth,
+            'types': dict(counts.most_common()),
+        }
+
+    tracemalloc.start()
+    for name, diagram in built.items():
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        render_svg(diagram, minify, links)
+        report[name]['peak_kib'] = round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+    tracemalloc.stop()
+
+    types = Counter()
+    for entry in report.values():
+        types.update(entry['types'])
+    outliers = {}
+    for key in ('build_ms', 'render_ms', 'bytes', 'peak_kib', 'nodes', 'depth'):
+        values = {name: entry[key] for name, entry in report.items() if entry[key] is not None}
+        if not values:
+            continue
+        median = _median(values.values())
+        limit = max(median * OUTLIER_FACTOR, median + (OUTLIER_MIN_MS if key.endswith('_ms') else 0))
+        flagged = sorted((name for name, value in values.items() if value > limit),
+                         key=lambda name: -values[name])
+        if flagged:
+            outliers[key] = flagged
+    return {
+        'options': {'minify': minify, 'outlier_factor': OUTLIER_FACTOR},
+        'totals': {key: round(sum(entry[key] or 0 for entry in report.values()), 3)
+                   for key in ('build_ms', 'render_ms', 'bytes', 'nodes')},
+        'types': dict(types.most_common()),
+        'outliers': outliers,
+        'rules': report,
+    }
+
+def print_stats(stats, top=15):
+    """Tabla de las reglas más lentas de renderizar, tipos y valores atípicos"""
+    rules = stats['rules']
+    flags = {}
+    for key, names in stats['outliers'].items():
+        for name in names:
+            flags.setdefault(name, []).append(key)
+    slowest = sorted(rules, key=lambda name: -rules[name]['render_ms'])
+    shown = slowest[:top] + [name for name in slowest[top:] if name in flags]
+    print(f"\n📊 Estadísticas por regla ({min(top, len(rules))} más lentas de {len(rules)}"
+          f"{' y las atípicas' if len(shown) > top else ''})")
+    print(f"  {'regla':<22} {'nodos':>7} {'prof.':>5} {'constr. ms':>10} {'render ms':>10} "
+          f"{'bytes':>9} {'pico KiB':>9}")
+    for name in shown:
+        entry = rules[name]
+        build_ms = '-' if entry['build_ms'] is None else f"{entry['build_ms']:.2f}"
+        mark = f"  ⚠ {', '.join(flags[name])}" if name in flags else ''
+        print(f"  {name:<22} {entry['nodes']:>7} {entry['depth']:>5} {build_ms:>10} "
+              f"{entry['render_ms']:>10.2f} {entry['bytes']:>9} {entry['peak_kib']:>9.1f}{mark}")
+    totals = stats['totals']
+    build_ms = f"{totals['build_ms']:.2f}" if any(rules[name]['build_ms'] is not None for name in rules) else '-'
+    print(f"  {'total':<22} {totals['nodes']:>7} {'':>5} {build_ms:>10} "
+          f"{totals['render_ms']:>10.2f} {totals['bytes']:>9}")
+    nodes = totals['nodes'] or 1
+    print("  Nodos por tipo: " + ", ".join(f"{kind} {count} ({count / nodes:.0%})"
+                                          for kind, count in stats['types'].items()))
+    if stats['outliers']:
+        print(f"  ⚠ Atípicos (más de {OUTLIER_FACTOR}× la mediana): " +
+              "; ".join(f"{key}: {', '.join(names)}" for key, names in stats['outliers'].items()))
+
+# ============================================================
+# ARCHIVOS DE SALIDA
+# ============================================================
+
+def _compressors():
+    """Variantes precomprimidas disponibles en la librería estándar"""
+    import gzip
+    found = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        from compression import zstd        # Python 3.14+
+        found['.zst'] = lambda data: zstd.compress(data, level=19)
+    except ImportError:
+        pass
+    return found
+
+def output_files(path, data, hash_names=False, compressors=None):
+    """Archivos a escribir para un SVG ya renderizado: {ruta: bytes}.
+    Con hash_names la ruta incluye un hash del contenido (svg/prog.<hash>.svg);
+    los precomprimidos (.gz, ...) se calculan sobre los mismos bytes en memoria."""
+    if hash_names:
+        stem, ext = os.path.splitext(path)
+        path = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    files = {path: data}
+    for suffix, compress in (compressors or {}).items():
+        files[path + suffix] = compress(data)
+    return files
+
+# ============================================================
+# CACHÉ DE CONSTRUCCIÓN
+# ============================================================
+
+MANIFEST = 'out/manifest.json'
+
+def write_atomic(path, data):
+    """Escribe bytes en un temporal y lo renombra: nunca queda un archivo a medias"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_if_changed(path, data):
+    """Escribe solo si el contenido cambió, para no tocar el mtime"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    write_atomic(path, data)
+    return True
+
+def load_manifest():
+    """Manifiesto de la última construcción (vacío si no existe o está dañado)"""
+    try:
+        with open(MANIFEST, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and isinstance(manifest.get('rules'), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def _entry(manifest, name):
+    """Entrada de una regla: {'digest', 'asset', 'files'} (rutas relativas a out/)"""
+    entry = manifest.get('rules', {}).get(name)
+    if isinstance(entry, dict):
+        return entry
+    # Manifiestos antiguos: solo la huella
+    return {'digest': entry, 'asset': f'svg/{name}.svg', 'files': [f'svg/{name}.svg']}
+
+def _remove(paths, say=print):
+    for path in paths:
+        try:
+            os.remove(os.path.join('out', path))
+            say(f"  ✗ out/{path}")
+        except FileNotFoundError:
+            pass
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera los railroad diagrams de B-Minor+")
+    parser.add_argument('--grammar', metavar='ARCHIVO',
+                        help="construir los diagramas a partir de un archivo BNF "
+                             "(p.ej. grammar_bminor_plus.txt) en lugar de las funciones d_*")
+    parser.add_argument('--force', action='store_true',
+                        help="ignorar la caché y regenerar todos los diagramas")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help="procesos para renderizar (por defecto: número de CPUs)")
+    parser.add_argument('--minify', action='store_true',
+                        help="SVG compacto: estilos en CSS, coordenadas cortas y conectores en un solo <path>")
+    parser.add_argument('--atlas', action='store_true',
+                        help="escribir también out/atlas.svg con todas las reglas en un solo archivo")
+    parser.add_argument('--compress', action='store_true',
+                        help="escribir versiones precomprimidas (.svg.gz, y .svg.zst si está disponible)")
+    parser.add_argument('--hash-names', action='store_true',
+                        help="nombrar los SVG por el hash de su contenido y escribir out/assets.json")
+    parser.add_argument('--inline', type=int, nargs='?', const=2, metavar='NIVELES',
+                        help="expandir las referencias a otras reglas hasta NIVELES niveles (por defecto 2)")
+    parser.add_argument('--inline-boxes', type=int, default=200, metavar='N',
+                        help="no expandir una regla si dibujaría más de N cajas (por defecto 200)")
+    parser.add_argument('--factor', action='store_true',
+                        help="sacar prefijos y sufijos comunes de las alternativas y simplificar "
+                             "los árboles antes de dibujarlos (informa de nodos y bytes ahorrados)")
+    parser.add_argument('--watch', action='store_true',
+                        help="seguir en marcha y regenerar al guardar la gramática o las definiciones")
+    parser.add_argument('--stats', action='store_true',
+                        help="medir cada regla (tiempos, nodos, profundidad, bytes, memoria) "
+                             "y escribir out/stats.json")
+    parser.add_argument('--profile', type=int, nargs='?', const=20, metavar='N',
+                        help="ejecutar la construcción con cProfile y mostrar las N funciones de "
+                             "railroad.py más costosas (usa --jobs 1; con --force se renderiza todo)")
+    args = parser.parse_args(argv)
+
+    compressors = _compressors() if args.compress else {}
+    savings = {} if args.factor else None
+    rules = load_rules(args, savings)
+    if savings:
+        print_savings(savings)
+    if args.stats:
+        stats = profile_rules(rules, args.minify, svg_links(rules))
+        os.makedirs('out', exist_ok=True)
+        write_if_changed('out/stats.json', json.dumps(stats, indent=1).encode())
+        print_stats(stats)
+        print("✅ Informe completo en out/stats.json\n")
+    if args.profile:
+        import cProfile
+        import pstats
+        # En los procesos hijos cProfile no vería el renderizado
+        args.jobs = 1
+        profiler = cProfile.Profile()
+        profiler.runcall(build, rules, args, compressors)
+        os.makedirs('out', exist_ok=True)
+        profiler.dump_stats('out/profile.pstats')
+        print("\n🔥 Funciones de railroad.py con más tiempo propio (perfil completo en out/profile.pstats):")
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(r'railroad\.py', args.profile)
+    else:
+        build(rules, args, compressors)
+    print("\n🎉 ¡Listo! Todos los diagramas han sido generados.")
+    if args.watch:
+        watch(args, compressors)
+
+def load_rules(args, savings=None):
+    """Registro de reglas según las opciones: funciones d_* o gramática BNF,
+    factorizadas y expandidas en línea si se pidió ('savings': ver factor_rules)"""
+    if args.grammar:
+        from bnf import load_grammar, compile_grammar
+        rules = compile_grammar(load_grammar(args.grammar))
+    elif args.watch:
+        # Las definiciones d_* se leen del archivo actual, no de las ya importadas
+        import runpy
+        rules = runpy.run_path(__file__, run_name='__diagrams__')['diagrams']
+    else:
+        rules = diagrams
+    if args.factor:
+        rules = factor_rules(rules, savings, args.minify)
+    if args.inline:
+        rules = inline_rules(rules, args.inline, args.inline_boxes)
+    return rules
+
+def svg_links(rules):
+    """Destino de cada caja NonTerminal en los SVG de out/svg: su regla en el atlas"""
+    return {name: f'../index.html#rule-{name}' for name in rules}
+
+def build(rules, args, compressors, verbose=True):
+    """Escribe en out/ los SVG que cambiaron, el atlas, el manifiesto y el
+    índice. Devuelve el número de diagramas regenerados y eliminados."""
+    say = print if verbose else (lambda *a, **k: None)
+
+    # Crear directorio de salida
+    os.makedirs('out/svg', exist_ok=True)
+
+    say("Generando railroad diagrams...")
+    options = {'minify': args.minify, 'hash_names': args.hash_names, 'compress': sorted(compressors)}
+    if args.factor:
+        options['factor'] = True
+    if args.inline:
+        options['inline'] = [args.inline, args.inline_boxes]
+    previous = load_manifest()
+    reuse = (not args.force and previous.get('renderer') == RENDERER_VERSION
+             and previous.get('options') == options)
+    # Cada caja NonTerminal enlaza con su regla en el atlas HTML; la huella
+    # incluye a qué reglas enlaza, para que aparecer o desaparecer una regla
+    # regenere los diagramas que la nombran
+    refs = cross_references(rules)
+    links = svg_links(rules)
+    current = {}
+    pending = []
+    for name, rule in rules.items():
+        diagram = get_diagram(rule)
+        linked = sorted(label for label, kind in refs[name].items() if kind == 'n' and label in links)
+        digest = hashlib.blake2b(f"{diagram.digest()}:{','.join(linked)}".encode(), digest_size=16).hexdigest()
+        old = _entry(previous, name)
+        if reuse and old['digest'] == digest and all(os.path.exists(os.path.join('out', p)) for p in old['files']):
+            current[name] = old
+        else:
+            current[name] = {'digest': digest}
+            pending.append((name, diagram))
+
+    svgs = render_all([diagram for _, diagram in pending], args.jobs, args.minify, links)
+    for (name, _), data in zip(pending, svgs):
+        files = output_files(f'svg/{name}.svg', data, args.hash_names, compressors)
+        for path, content in files.items():
+            write_atomic(os.path.join('out', path), content)
+        asset = next(iter(files))
+        say(f"  ✓ out/{asset}")
+        current[name].update(asset=asset, files=sorted(files))
+        if name in previous.get('rules', {}):
+            _remove(set(_entry(previous, name)['files']) - set(files), say)
+
+    # Diagramas de reglas que ya no existen
+    gone = sorted(previous.get('rules', {}).keys() - current.keys())
+    for name in gone:
+        _remove(_entry(previous, name)['files'], say)
+
+    assets = {name: entry['asset'] for name, entry in current.items()}
+    if args.hash_names:
+        write_if_changed('out/assets.json', json.dumps(assets, indent=1).encode())
+
+    say(f"\n✅ {len(rules)} diagramas en out/svg/: {len(pending)} regenerados, "
+        f"{len(rules) - len(pending)} sin cambios, {len(gone)} eliminados")
+
+    if args.atlas:
+        bundle = build_bundle(rules, args.minify, {name: f'#{name}' for name in rules})
+        atlas = output_files('atlas.svg', bundle, compressors=compressors)
+        for path, content in atlas.items():
+            write_if_changed(os.path.join('out', path), content)
+        separate = sum(os.path.getsize(os.path.join('out', asset)) for asset in assets.values())
+        if separate:
+            say(f"✅ out/atlas.svg: {len(bundle)} bytes "
+                f"({len(bundle) / separate:.0%} de los {separate} bytes de los {len(rules)} SVG separados)")
+        else:
+            say(f"✅ out/atlas.svg: {len(bundle)} bytes (sin SVG separados con los que comparar)")
+
+    manifest = {'renderer': RENDERER_VERSION, 'options': options, 'rules': current}
+    write_if_changed(MANIFEST, json.dumps(manifest, indent=1, sort_keys=True).encode())
+
+    # Generar índice en Markdown
+    say("\nGenerando índice...")
+    write_if_changed('out/index.md', index_markdown(rules, assets).encode())
+    say("✅ Índice generado en out/index.md")
+    index = search_index(rules, refs)
+    write_if_changed('out/search.json', json.dumps(index, separators=(',', ':')).encode())
+    write_if_changed('out/index.html', index_html(rules, assets, index=index).encode())
+    say("✅ Atlas generado en out/index.html (índice de búsqueda en out/search.json)")
+    return len(pending), len(gone)
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+def watch(args, compressors, interval=0.05):
+    """Consulta cada 'interval' segundos si cambió la gramática (o este
+    archivo, con las funciones d_*) y regenera solo las reglas afectadas.
+    Sin dependencias: os.stat sobre los archivos vigilados."""
+    import time
+    from bnf import GrammarError
+
+    paths = [args.grammar] if args.grammar else [os.path.abspath(__file__)]
+    stamps = {path: _stamp(path) for path in paths}
+    # Tras la primera construcción cada ciclo cambia pocas reglas: se
+    # renderizan en este proceso, sin el coste de arrancar un pool
+    args.jobs = 1
+    print(f"\n👀 Vigilando {', '.join(paths)} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(interval)
+            changed = [path for path in paths if _stamp(path) != stamps[path]]
+            if not changed:
+                continue
+            t0 = time.perf_counter()
+            for path in changed:
+                stamps[path] = _stamp(path)
+            try:
+                regenerated, gone = build(load_rules(args), args, compressors, verbose=False)
+            except (GrammarError, SyntaxError, OSError) as e:
+                print(f"❌ {e}")
+                continue
+            except Exception as e:
+                # Una definición d_* a medio editar no debe parar la vigilancia
+                print(f"❌ {type(e).__name__}: {e}")
+                continue
+            elapsed = (time.perf_counter() - t0) * 1000
+            print(f"[{time.strftime('%H:%M:%S')}] {', '.join(os.path.basename(p) for p in changed)}: "
+                  f"{regenerated} regenerados, {gone} eliminados en {elapsed:.1f} ms")
+    except KeyboardInterrupt:
+        print("\n👋 Fin de la vigilancia")
 
-print("✅ Índice generado en out/index.md")
-print("\n🎉 ¡Listo! Todos los diagramas han sido generados.")
+if __name__ == '__main__':
+    main()
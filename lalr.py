@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Tablas LALR(1)
+Construye el autómata LR(0) de una gramática BNF, calcula los lookahead
+LALR(1) (propagación de lookaheads, como yacc/bison) e informa de los
+conflictos desplazamiento/reducción y reducción/reducción.
+
+Las tablas ACTION/GOTO se guardan comprimidas por desplazamiento de filas
+(base/check/valor con una reducción por defecto en cada estado) en arrays
+de enteros, que se cargan con frombytes sin analizar nada.
+
+    python3 lalr.py grammar_bminor_plus.txt -o out/bminor.lalr
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+from analysis import analyze, bits, propagate
+from bnf import GrammarError, load_grammar
+
+class ParseError(ValueError):
+    pass
+
+# ============================================================
+# AUTÓMATA
+# ============================================================
+
+class Automaton:
+    """Autómata LALR(1). Los ítems son enteros: start[p] + punto; los
+    lookahead son bitsets sobre los terminales de Analysis."""
+    __slots__ = ('analysis', 'productions', 'start', 'after', 'prod_of',
+                 'states', 'transitions', 'reductions',
+                 '_rest_first', '_rest_nullable', '_starts_of')
+
+    def __init__(self, analysis):
+        if analysis.undefined:
+            raise GrammarError(f"símbolos sin definir: {', '.join(analysis.undefined)}")
+        self.analysis = analysis
+        base = len(analysis.terminals)
+        # Producción 0: S' ::= inicio (el no terminal S' va al final)
+        self.productions = [(len(analysis.nonterminals), (base,))] + analysis.productions
+        self._items()
+        self._build()
+
+    def _items(self):
+        a = self.analysis
+        base = len(a.terminals)
+        self.start = []
+        self.after = []        # símbolo tras el punto (-1 si el ítem está completo)
+        self.prod_of = []
+        for p, (lhs, rhs) in enumerate(self.productions):
+            self.start.append(len(self.after))
+            self.after.extend(rhs)
+            self.after.append(-1)
+            self.prod_of.extend([p] * (len(rhs) + 1))
+
+        # FIRST de lo que sigue al símbolo tras el punto, y si es anulable
+        self._rest_first = [0] * len(self.after)
+        self._rest_nullable = [True] * len(self.after)
+        for p, (lhs, rhs) in enumerate(self.productions):
+            first, nullable = 0, True
+            for d in range(len(rhs) - 1, -1, -1):
+                i = self.start[p] + d
+                self._rest_first[i] = first
+                self._rest_nullable[i] = nullable
+                s = rhs[d]
+                if s < base:
+                    first, nullable = 1 << s, False
+                elif a.nullable >> (s - base) & 1:
+                    first |= a.first[s - base]
+                else:
+                    first, nullable = a.first[s - base], False
+
+        self._starts_of = [[] for _ in range(len(a.nonterminals) + 1)]
+        for p, (lhs, rhs) in enumerate(self.productions):
+            self._starts_of[lhs].append(self.start[p])
+
+    def _closure(self, kernel, base):
+        """Lookahead de cada no terminal del cierre. Los bits por encima de
+        'base' representan los lookahead (aún desconocidos) de cada ítem
+        del núcleo: así un solo cierre da los lookahead espontáneos y las
+        propagaciones de todo el estado."""
+        after = self.after
+        rest_first = self._rest_first
+        rest_nullable = self._rest_nullable
+        starts_of = self._starts_of
+        la = {}
+        work = []
+
+        def push(item, mask):
+            s = after[item]
+            if s < base:
+                return
+            b = s - base
+            m = rest_first[item] | (mask if rest_nullable[item] else 0)
+            old = la.get(b, 0)
+            if old | m != old:
+                la[b] = old | m
+                work.append(b)
+
+        for k, item in enumerate(kernel):
+            push(item, 1 << (base + k))
+        while work:
+            b = work.pop()
+            mask = la[b]
+            for item in starts_of[b]:
+                push(item, mask)
+        return la
+
+    def _build(self):
+        base = len(self.analysis.terminals)
+        terms = (1 << base) - 1
+        after = self.after
+
+        self.states = [(self.start[0],)]
+        index = {self.states[0]: 0}
+        offset = [0]                   # primer ítem del núcleo de cada estado
+        lookahead = [1 << (base - 1)]  # '$' para S' ::= . inicio
+        edges = [set()]
+        self.transitions = []
+        pending_reductions = []
+
+        s = 0
+        while s < len(self.states):
+            kernel = self.states[s]
+            la = self._closure(kernel, base)
+            items = [(item, 1 << (base + k)) for k, item in enumerate(kernel)]
+            for b, mask in la.items():
+                items.extend((item, mask) for item in self._starts_of[b])
+
+            moves = {}
+            reduces = []
+            for item, mask in items:
+                x = after[item]
+                if x == -1:
+                    reduces.append((self.prod_of[item], mask))
+                else:
+                    target = moves.setdefault(x, {})
+                    target[item + 1] = target.get(item + 1, 0) | mask
+
+            row = {}
+            for x, target in moves.items():
+                key = tuple(sorted(target))
+                t = index.get(key)
+                if t is None:
+                    t = index[key] = len(self.states)
+                    self.states.append(key)
+                    offset.append(len(lookahead))
+                    lookahead.extend([0] * len(key))
+                    edges.extend(set() for _ in key)
+                row[x] = t
+                for j, item in enumerate(key):
+                    g = offset[t] + j
+                    mask = target[item]
+                    lookahead[g] |= mask & terms
+                    for k in bits(mask >> base):
+                        edges[offset[s] + k].add(g)
+            self.transitions.append(row)
+            pending_reductions.append(reduces)
+            s += 1
+
+        propagate(lookahead, edges)
+
+        # Lookahead final de cada reducción: espontáneos + los del núcleo
+        self.reductions = []
+        for s, reduces in enumerate(pending_reductions):
+            row = {}
+            for p, mask in reduces:
+                final = mask & terms
+                for k in bits(mask >> base):
+                    final |= lookahead[offset[s] + k]
+                row[p] = row.get(p, 0) | final
+            self.reductions.append(row)
+
+    # --------------------------------------------------------
+    # Presentación
+    # --------------------------------------------------------
+
+    def symbol_name(self, s):
+        a = self.analysis
+        base = len(a.terminals)
+        if s < base:
+            return f"'{a.terminals[s]}'"
+        n = s - base
+        return a.nonterminals[n] if n < len(a.nonterminals) else "S'"
+
+    def item_text(self, item):
+        p = self.prod_of[item]
+        lhs, rhs = self.productions[p]
+        dot = item - self.start[p]
+        names = [self.symbol_name(s) for s in rhs]
+        names.insert(dot, '.')
+        return f"{self.symbol_name(len(self.analysis.terminals) + lhs)} ::= {' '.join(names)}"
+
+    def production_text(self, p):
+        lhs, rhs = self.productions[p]
+        names = " ".join(self.symbol_name(s) for s in rhs)
+        return f"{self.symbol_name(len(self.analysis.terminals) + lhs)} ::= {names}"
+
+    def closure_items(self, s):
+        """Ítems LR(0) del estado s (núcleo y cierre)"""
+        la = self._closure(self.states[s], len(self.analysis.terminals))
+        items = list(self.states[s])
+        for b in la:
+            items.extend(self._starts_of[b])
+        return items
+
+# ============================================================
+# TABLAS
+# ============================================================
+
+def _resolve(automaton):
+    """Filas ACTION (estado -> {terminal: valor}) y lista de conflictos.
+    Valor: s + 1 desplaza a s, -(p + 1) reduce por p (p = 0 acepta).
+    Se resuelve como yacc: desplazar antes que reducir y, entre
+    reducciones, la producción que aparece antes."""
+    base = len(automaton.analysis.terminals)
+    rows = []
+    conflicts = []
+    for s, (moves, reduces) in enumerate(zip(automaton.transitions, automaton.reductions)):
+        row = {x: t + 1 for x, t in moves.items() if x < base}
+        for p in sorted(reduces):
+            for t in bits(reduces[p]):
+                old = row.get(t)
+                if old is None:
+                    row[t] = -(p + 1)
+                else:
+                    kind = 'desplazamiento/reducción' if old > 0 else 'reducción/reducción'
+                    conflicts.append((s, t, kind, old, p))
+        rows.append(row)
+    return rows, conflicts
+
+def _defaults(rows):
+    """Saca de cada fila su valor más frecuente si es una reducción. Aceptar
+    (-1, producción 0) nunca es valor por defecto: solo vale con '$'"""
+    defaults = []
+    for row in rows:
+        counts = {}
+        for v in row.values():
+            if v < -1:
+                counts[v] = counts.get(v, 0) + 1
+        if counts:
+            d = max(counts, key=lambda v: (counts[v], v))
+            for t in [t for t, v in row.items() if v == d]:
+                del row[t]
+            defaults.append(d)
+        else:
+            defaults.append(0)
+    return defaults
+
+def _pack(rows):
+    """Desplazamiento de filas: cada fila se coloca en el primer hueco de un
+    vector común; check guarda la columna de cada casilla ocupada. Las filas
+    idénticas comparten base; dos filas distintas nunca la comparten."""
+    base = [0] * len(rows)
+    check = []
+    value = []
+    occupied = 0            # bitset de casillas ocupadas
+    used = set()
+    placed = {}
+    order = sorted(range(len(rows)), key=lambda r: -len(rows[r]))
+    empty = []
+    for r in order:
+        row = rows[r]
+        if not row:
+            empty.append(r)
+            continue
+        key = tuple(sorted(row.items()))
+        if key in placed:
+            base[r] = placed[key]
+            continue
+        cols = [c for c, _ in key]
+        pattern = 0
+        for c in cols:
+            pattern |= 1 << c
+        free = (~occupied & (occupied + 1)).bit_length() - 1   # primera casilla libre
+        b = max(0, free - cols[0])
+        while (occupied >> b) & pattern or b in used:
+            b += 1
+        occupied |= pattern << b
+        used.add(b)
+        placed[key] = base[r] = b
+        end = b + cols[-1] + 1
+        if end > len(check):
+            check.extend([-1] * (end - len(check)))
+            value.extend([0] * (end - len(value)))
+        for c, v in key:
+            check[b + c] = c
+            value[b + c] = v
+    # Las filas vacías apuntan más allá del final: siempre valor por defecto
+    for r in empty:
+        base[r] = len(check)
+    return base, check, value
+
+def _compact(values):
+    """array con el tipo entero más pequeño que admite los valores"""
+    lo = min(values, default=0)
+    hi = max(values, default=0)
+    for code in 'bhi':
+        limit = 1 << (8 * array(code).itemsize - 1)
+        if -limit <= lo and hi < limit:
+            return array(code, values)
+    return array('q', values)
+
+class Tables:
+    """Tablas ACTION/GOTO comprimidas y el analizador que las usa"""
+    __slots__ = ('terminals', 'nonterminals', 'arrays', '_term_id')
+
+    # Orden de los arrays en el archivo
+    NAMES = ('action_base', 'action_check', 'action_value', 'action_default',
+             'goto_base', 'goto_check', 'goto_value', 'goto_default',
+             'prod_lhs', 'prod_len')
+    MAGIC = b'LALR\x01'
+
+    def __init__(self, terminals, nonterminals, arrays):
+        self.terminals = terminals
+        self.nonterminals = nonterminals
+        self.arrays = arrays
+        self._term_id = {t: i for i, t in enumerate(terminals)}
+
+    @classmethod
+    def build(cls, automaton):
+        """Tablas y lista de conflictos"""
+        a = automaton.analysis
+        base = len(a.terminals)
+        rows, conflicts = _resolve(automaton)
+        action_default = _defaults(rows)
+        action = _pack(rows)
+
+        # GOTO por columnas (no terminal -> {estado: destino}) con el destino
+        # más frecuente como valor por defecto, como hace bison
+        columns = [{} for _ in a.nonterminals]
+        for s, moves in enumerate(automaton.transitions):
+            for x, t in moves.items():
+                if x >= base and x - base < len(columns):
+                    columns[x - base][s] = t
+        goto_default = []
+        for col in columns:
+            counts = {}
+            for t in col.values():
+                counts[t] = counts.get(t, 0) + 1
+            d = max(counts, key=lambda t: (counts[t], -t)) if counts else 0
+            for s in [s for s, t in col.items() if t == d]:
+                del col[s]
+            goto_default.append(d)
+        goto = _pack(columns)
+
+        lhs = [p[0] for p in automaton.productions]
+        length = [len(p[1]) for p in automaton.productions]
+        arrays = [_compact(v) for v in (*action, action_default, *goto, goto_default, lhs, length)]
+        return cls(list(a.terminals), list(a.nonterminals), dict(zip(cls.NAMES, arrays))), conflicts
+
+    # --------------------------------------------------------
+    # Archivo
+    # --------------------------------------------------------
+
+    def to_bytes(self):
+        """MAGIC, cabecera JSON con los nombres y los arrays en little-endian"""
+        header = json.dumps({'terminals': self.terminals, 'nonterminals': self.nonterminals},
+                            separators=(',', ':')).encode('utf-8')
+        parts = [self.MAGIC, struct.pack('<I', len(header)), header]
+        for name in self.NAMES:
+            arr = self.arrays[name]
+            if sys.byteorder == 'big':
+                arr = array(arr.typecode, arr)
+                arr.byteswap()
+            parts.append(struct.pack('<cI', arr.typecode.encode(), len(arr)))
+            parts.append(arr.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("no es un archivo de tablas LALR")
+        pos = len(cls.MAGIC)
+        (size,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        header = json.loads(data[pos:pos + size])
+        pos += size
+        arrays = {}
+        for name in cls.NAMES:
+            code, count = struct.unpack_from('<cI', data, pos)
+            pos += 5
+            arr = array(code.decode())
+            end = pos + count * arr.itemsize
+            arr.frombytes(data[pos:end])
+            if sys.byteorder == 'big':
+                arr.byteswap()
+            arrays[name] = arr
+            pos = end
+        return cls(header['terminals'], header['nonterminals'], arrays)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    # --------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------
+
+    def action(self, state, terminal):
+        """s + 1 desplaza, -(p + 1) reduce (p = 0 acepta), 0 error"""
+        t = self.arrays
+        i = t['action_base'][state] + terminal
+        if i < len(t['action_check']) and t['action_check'][i] == terminal:
+            return t['action_value'][i]
+        return t['action_default'][state]
+
+    def goto(self, state, nonterminal):
+        t = self.arrays
+        i = t['goto_base'][nonterminal] + state
+        if i < len(t['goto_check']) and t['goto_check'][i] == state:
+            return t['goto_value'][i]
+        return t['goto_default'][nonterminal]
+
+    def expected(self, state):
+        """Terminales con acción explícita en el estado"""
+        return [name for t, name in enumerate(self.terminals)
+                if self.action(state, t) and self.action(state, t) != self.arrays['action_default'][state]]
+
+    def parse(self, kinds):
+        """Reconoce una secuencia de tipos de token (nombres de terminal);
+        el fin de entrada '$' se añade solo. Devuelve el número de tokens."""
+        t = self.arrays
+        a_base, a_check, a_value, a_default = (t[n] for n in self.NAMES[:4])
+        g_base, g_check, g_value, g_default = (t[n] for n in self.NAMES[4:8])
+        lhs, length = t['prod_lhs'], t['prod_len']
+        a_size, g_size = len(a_check), len(g_check)
+        term_id = self._term_id
+        end = len(self.terminals) - 1
+
+        stack = [0]
+        state = 0
+        count = 0
+        tokens = iter(kinds)
+        for kind in tokens:
+            tok = term_id.get(kind)
+            if tok is None or tok == end:
+                raise ParseError(f"token {count}: tipo desconocido {kind!r}")
+            break
+        else:
+            tok = end
+        while True:
+            i = a_base[state] + tok
+            if i < a_size and a_check[i] == tok:
+                v = a_value[i]
+            else:
+                v = a_default[state]
+            if v > 0:
+                state = v - 1
+                stack.append(state)
+                count += 1
+                kind = next(tokens, None)
+                if kind is None:
+                    tok = end
+                else:
+                    tok = term_id.get(kind)
+                    if tok is None or tok == end:
+                        raise ParseError(f"token {count}: tipo desconocido {kind!r}")
+            elif v < 0:
+                p = -v - 1
+                if p == 0:
+                    if tok != end:
+                        raise ParseError(f"token {count}: sobra '{self.terminals[tok]}' tras el final del programa")
+                    return count
+                n = length[p]
+                if n:
+                    del stack[-n:]
+                nt = lhs[p]
+                i = g_base[nt] + stack[-1]
+                state = g_value[i] if i < g_size and g_check[i] == stack[-1] else g_default[nt]
+                stack.append(state)
+            else:
+                found = self.terminals[tok]
+                expected = ", ".join(self.expected(state))
+                raise ParseError(f"token {count}: inesperado '{found}' (se esperaba {expected})")
+
+    def stats(self):
+        states = len(self.arrays['action_default'])
+        dense = states * (len(self.terminals) + len(self.nonterminals))
+        packed = sum(len(self.arrays[n]) for n in self.NAMES[:8])
+        size = sum(a.itemsize * len(a) for a in self.arrays.values())
+        return states, dense, packed, size
+
+# ============================================================
+# INFORME
+# ============================================================
+
+def conflict_report(automaton, conflicts):
+    """Conflictos con las reglas implicadas, agrupados por estado"""
+    lines = []
+    base = len(automaton.analysis.terminals)
+    by_state = {}
+    for c in conflicts:
+        by_state.setdefault(c[0], []).append(c)
+    for s, found in by_state.items():
+        items = automaton.closure_items(s)
+        for _, t, kind, old, p in found:
+            lines.append(f"estado {s}, símbolo {automaton.symbol_name(t)}: {kind}")
+            if old > 0:
+                for item in items:
+                    if automaton.after[item] == t:
+                        lines.append(f"  desplazar  {automaton.item_text(item)}")
+            else:
+                lines.append(f"  reducir    {automaton.production_text(-old - 1)}")
+            lines.append(f"  reducir    {automaton.production_text(p)}")
+            winner = "desplazar" if old > 0 else "la primera reducción"
+            lines.append(f"  resuelto: {winner}")
+    return "\n".join(lines)
+
+def build(grammar):
+    """Autómata, tablas y conflictos de una gramática"""
+    automaton = Automaton(analyze(grammar))
+    tables, conflicts = Tables.build(automaton)
+    return automaton, tables, conflicts
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tablas LALR(1) de una gramática BNF")
+    parser.add_argument('grammar', nargs='?', default='grammar_bminor_plus.txt',
+                        help="archivo de la gramática (por defecto grammar_bminor_plus.txt)")
+    parser.add_argument('-o', '--output', default='out/bminor.lalr',
+                        help="archivo de tablas (por defecto out/bminor.lalr)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    automaton, tables, conflicts = build(load_grammar(args.grammar))
+    t1 = time.perf_counter()
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    tables.save(args.output)
+
+    states, dense, packed, size = tables.stats()
+    shift_reduce = sum(1 for c in conflicts if c[2].startswith('desplazamiento'))
+    print(f"{states} estados, {len(automaton.productions) - 1} producciones")
+    print(f"Tabla: {packed} casillas frente a {dense} densas, {size} bytes en {args.output}")
+    if conflicts:
+        print(f"\n❌ {len(conflicts)} conflictos ({shift_reduce} desplazamiento/reducción, "
+              f"{len(conflicts) - shift_reduce} reducción/reducción):\n")
+        print(conflict_report(automaton, conflicts))
+    else:
+        print("\n✅ Sin conflictos: la gramática es LALR(1)")
+    print(f"\n⏱  construcción {(t1 - t0) * 1000:.1f} ms")
+    return 1 if conflicts else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Pasada de maquetación
+Recorre el árbol de un diagrama una sola vez y deja primitivas con posición
+absoluta (rectángulos, texto, líneas, curvas cuadráticas, círculos) en un
+búfer por columnas (array). Los serializadores leen ese búfer sin volver a
+calcular coordenadas: SVG, volcado JSON y texto para la terminal.
+
+La geometría es la de railroad.py: el recorrido usa los mismos _steps() de
+cada componente con un contexto (LayoutBuilder) que, en lugar de formatear
+SVG, anota cada conector y cada caja en el búfer.
+
+    python3 layout.py stmt --format txt
+    python3 layout.py expr1 --format json --grammar grammar_bminor_plus.txt
+"""
+
+import html
+import json
+import math
+import sys
+import weakref
+from array import array
+
+from railroad import SvgContext, Terminal
+
+# Tipos de primitiva. Significado de las columnas en cada una:
+#   RECT, ROUND, FRAME      (x0, y0) esquina superior izquierda, (x1, y1) inferior derecha
+#   TEXT, BOLD, LABEL       (x0, y0) punto de anclaje (línea base), texto en 'ref'
+#   LINE                    de (x0, y0) a (x1, y1)
+#   QUAD                    de (x0, y0) a (x2, y2) con control en (x1, y1)
+#   CIRCLE                  centro (x0, y0), radio x1
+RECT, ROUND, FRAME, TEXT, BOLD, LABEL, LINE, QUAD, CIRCLE = range(9)
+KIND_NAMES = ('rect', 'round', 'frame', 'text', 'bold', 'label', 'line', 'quad', 'circle')
+
+class Layout:
+    """Primitivas de un diagrama en columnas paralelas"""
+    __slots__ = ('width', 'height', 'kind', 'x0', 'y0', 'x1', 'y1', 'x2', 'y2', 'ref', 'strings', '_index')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.kind = array('B')
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.x2 = array('d')
+        self.y2 = array('d')
+        self.ref = array('l')
+        self.strings = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, x0, y0, x1=0, y1=0, x2=0, y2=0, text=None):
+        ref = -1
+        if text is not None:
+            ref = self._index.get(text)
+            if ref is None:
+                ref = self._index[text] = len(self.strings)
+                self.strings.append(text)
+        self.kind.append(kind)
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.x2.append(x2)
+        self.y2.append(y2)
+        self.ref.append(ref)
+
+    def nbytes(self):
+        """Memoria de las columnas (sin contar los textos)"""
+        return sum(col.itemsize * len(col) for col in
+                   (self.kind, self.x0, self.y0, self.x1, self.y1, self.x2, self.y2, self.ref))
+
+class LayoutBuilder:
+    """Contexto de railroad.py que anota primitivas en vez de escribir SVG.
+    Se presenta como un SvgContext en modo minify con símbolos, así los
+    conectores llegan por path() y las cajas y reglas expandidas por use() y
+    share(); lo que los componentes escriban en 'out' se descarta."""
+    __slots__ = ('layout', '_pen')
+
+    minify = True
+    symbols = {}
+    links = None        # los enlaces los pone el serializador (write_svg)
+
+    def __init__(self, layout):
+        self.layout = layout
+        self._pen = None
+
+    def num(self, value):
+        return str(value)
+
+    def path(self, *d):
+        add = self.layout.add
+        i = 0
+        while i < len(d):
+            cmd = d[i]
+            if cmd == 'Q':
+                cx, cy, x, y = d[i + 1:i + 5]
+                add(QUAD, *self._pen, cx, cy, x, y)
+                i += 5
+            else:
+                x, y = d[i + 1], d[i + 2]
+                if cmd == 'L':
+                    add(LINE, *self._pen, x, y)
+                i += 3
+            self._pen = (x, y)
+
+    def write_path(self, out):
+        pass
+
+    def use(self, out, node, x, y):
+        # Mismas posiciones que Terminal/NonTerminal.write_box
+        terminal = isinstance(node, Terminal)
+        self.layout.add(ROUND if terminal else RECT, x, y, x + node.width, y + node.height)
+        self.layout.add(BOLD if terminal else TEXT, x + node.width / 2, y + node.height / 2 + 5, text=node.text)
+
+    def share(self, out, node, x, y):
+        # Marco y nombre como en Inlined.write_frame; el árbol se recorre en su sitio
+        self.layout.add(FRAME, x + 10, y + 2, x + node.width - 10, y + node.height - 2)
+        self.layout.add(LABEL, x + 15, y + 14, text=node.name)
+        node.write_frame(_discard, x, y, self)
+
+def _discard(fragment):
+    pass
+
+# Maquetaciones ya calculadas, por raíz del árbol: los nodos están internados,
+# así que diagramas iguales comparten la misma entrada mientras vivan
+_layouts = weakref.WeakKeyDictionary()
+
+def layout(diagram):
+    """Layout del diagrama (calculado una sola vez por árbol)"""
+    result = _layouts.get(diagram.root)
+    if result is None:
+        result = _layouts[diagram.root] = _build(diagram)
+    return result
+
+def _build(diagram):
+    # Mismo recorrido que Diagram.write_content
+    result = Layout(diagram.width, diagram.height)
+    builder = LayoutBuilder(result)
+    root = diagram.root
+    y_mid = 20 + root.height / 2
+    result.add(CIRCLE, 10, y_mid, 5)
+    builder.path('M', 10, y_mid, 'L', 30, y_mid)
+    root.write_svg(_discard, 30, 20, builder)
+    builder.path('M', 30 + root.width, y_mid, 'L', diagram.width - 10, y_mid)
+    result.add(CIRCLE, diagram.width - 10, y_mid, 5)
+    return result
+
+# ------------------------------------------------------------
+# Serializadores: write_*(layout, out) con out(fragmento)
+# ------------------------------------------------------------
+
+_STYLE = ('<style>text{font:14px monospace;text-anchor:middle}.b{font-weight:bold}'
+          '.l{font-size:11px;text-anchor:start;fill:#555}'
+          'rect{stroke:#000;stroke-width:2}.t{fill:#90EE90}.n{fill:#87CEEB}'
+          '.f{fill:none;stroke:#888;stroke-width:1;stroke-dasharray:4 3}'
+          'path{stroke:#000;stroke-width:2;fill:none}</style>')
+
+_RECT_ATTRS = {RECT: ' class="n"', ROUND: ' class="t" rx="10"', FRAME: ' class="f" rx="6"'}
+_TEXT_ATTRS = {TEXT: '', BOLD: ' class="b"', LABEL: ' class="l"'}
+
+def write_svg(lay, out, style=True, links=None):
+    """SVG compacto: cajas y textos en orden, todos los conectores en un <path>.
+    style=False omite el <style>, p.ej. si otro SVG de la misma página ya lo trae;
+    links: {regla: href} para enlazar las cajas de los no terminales."""
+    close = -1
+    ctx = SvgContext(minify=True)
+    n = ctx.num
+    out(f'<svg width="{n(lay.width)}" height="{n(lay.height)}" xmlns="http://www.w3.org/2000/svg">'
+        f'{_STYLE if style else ""}')
+    kinds, x0, y0, x1, y1, x2, y2, ref, strings = (
+        lay.kind, lay.x0, lay.y0, lay.x1, lay.y1, lay.x2, lay.y2, lay.ref, lay.strings)
+    for i in range(len(kinds)):
+        kind = kinds[i]
+        if kind == LINE:
+            ctx.path('M', x0[i], y0[i], 'L', x1[i], y1[i])
+        elif kind == QUAD:
+            ctx.path('M', x0[i], y0[i], 'Q', x1[i], y1[i], x2[i], y2[i])
+        elif kind in _RECT_ATTRS:
+            # La caja de un no terminal va seguida de su texto: ambos dentro del <a>
+            if kind == RECT and links is not None:
+                href = links.get(strings[ref[i + 1]])
+                if href is not None:
+                    out(f'<a href="{html.escape(href)}">')
+                    close = i + 1
+            out(f'<rect{_RECT_ATTRS[kind]} x="{n(x0[i])}" y="{n(y0[i])}" '
+                f'width="{n(x1[i] - x0[i])}" height="{n(y1[i] - y0[i])}"/>')
+        elif kind in _TEXT_ATTRS:
+            out(f'<text{_TEXT_ATTRS[kind]} x="{n(x0[i])}" y="{n(y0[i])}">'
+                f'{html.escape(strings[ref[i]], quote=False)}</text>')
+            if i == close:
+                out('</a>')
+        elif kind == CIRCLE:
+            out(f'<circle cx="{n(x0[i])}" cy="{n(y0[i])}" r="{n(x1[i])}"/>')
+    ctx.write_path(out)
+    out('</svg>')
+
+# Columnas que usa cada tipo de primitiva en el volcado JSON
+_FIELDS = {RECT: ('x0', 'y0', 'x1', 'y1'), ROUND: ('x0', 'y0', 'x1', 'y1'), FRAME: ('x0', 'y0', 'x1', 'y1'),
+           TEXT: ('x0', 'y0'), BOLD: ('x0', 'y0'), LABEL: ('x0', 'y0'),
+           LINE: ('x0', 'y0', 'x1', 'y1'), QUAD: ('x0', 'y0', 'x1', 'y1', 'x2', 'y2'), CIRCLE: ('x0', 'y0', 'x1')}
+
+def write_json(lay, out):
+    """Una primitiva por línea: {"kind": ..., coordenadas..., "text": ...}"""
+    out(f'{{"width": {lay.width}, "height": {lay.height}, "primitives": [')
+    for i in range(len(lay)):
+        kind = lay.kind[i]
+        record = {'kind': KIND_NAMES[kind]}
+        for field in _FIELDS[kind]:
+            record[field] = round(getattr(lay, field)[i], 2)
+        if lay.ref[i] >= 0:
+            record['text'] = lay.strings[lay.ref[i]]
+        out(('\n ' if i == 0 else ',\n ') + json.dumps(record, ensure_ascii=False))
+    out('\n]}\n')
+
+# Tamaño en píxeles de una celda de texto: 8 px es el ancho por carácter que
+# usan las cajas, así que el texto cabe justo; 10 px dan 3 filas por caja
+CELL_W = 8
+CELL_H = 10
+
+def write_text(lay, out):
+    """Dibujo en caracteres ASCII para la terminal"""
+    cols = math.ceil(lay.width / CELL_W) + 1
+    rows = math.ceil(lay.height / CELL_H) + 1
+    grid = [[' '] * cols for _ in range(rows)]
+    fixed = [[False] * cols for _ in range(rows)]
+
+    def put(col, row, ch, lock=False):
+        if 0 <= row < rows and 0 <= col < cols and (lock or not fixed[row][col]):
+            grid[row][col] = ch
+            fixed[row][col] = fixed[row][col] or lock
+
+    def cell(x, y):
+        return math.floor(x / CELL_W), math.floor(y / CELL_H)
+
+    def stroke(points):
+        # Cada tramo entre muestras se marca con el carácter de su pendiente
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            dx, dy = (bx - ax) / CELL_W, (by - ay) / CELL_H
+            if abs(dy) <= abs(dx) / 2:
+                ch = '-'
+            elif abs(dx) <= abs(dy) / 2:
+                ch = '|'
+            else:
+                ch = '\\' if (dx > 0) == (dy > 0) else '/'
+            col, row = cell((ax + bx) / 2, (ay + by) / 2)
+            put(col, row, ch)
+
+    def samples(length):
+        return max(2, int(length / min(CELL_W, CELL_H) * 2) + 1)
+
+    kinds, x0, y0, x1, y1, x2, y2 = lay.kind, lay.x0, lay.y0, lay.x1, lay.y1, lay.x2, lay.y2
+    # Primero los conectores; cajas y textos se escriben encima
+    for i in range(len(kinds)):
+        kind = kinds[i]
+        if kind == LINE:
+            steps = samples(math.hypot(x1[i] - x0[i], y1[i] - y0[i]))
+            stroke([(x0[i] + (x1[i] - x0[i]) * t / steps, y0[i] + (y1[i] - y0[i]) * t / steps)
+                    for t in range(steps + 1)])
+        elif kind == QUAD:
+            steps = samples(math.hypot(x1[i] - x0[i], y1[i] - y0[i]) + math.hypot(x2[i] - x1[i], y2[i] - y1[i]))
+            points = []
+            for k in range(steps + 1):
+                t = k / steps
+                u = 1 - t
+                points.append((u * u * x0[i] + 2 * u * t * x1[i] + t * t * x2[i],
+                               u * u * y0[i] + 2 * u * t * y1[i] + t * t * y2[i]))
+            stroke(points)
+    for i in range(len(kinds)):
+        kind = kinds[i]
+        if kind in _RECT_ATTRS:
+            # Celdas por el centro de la primera fila/columna; el tamaño en
+            # celdas depende solo del de la caja, no de su posición
+            c0, r0 = cell(x0[i] + CELL_W / 2, y0[i] + CELL_H / 2)
+            c1 = c0 + round((x1[i] - x0[i]) / CELL_W)
+            r1 = r0 + max(2, round((y1[i] - y0[i]) / CELL_H) - 1)
+            horizontal, vertical = ('-', '|') if kind != FRAME else ('.', ':')
+            corners = {RECT: '++++', ROUND: "..''", FRAME: "..''"}[kind]
+            for col in range(c0, c1 + 1):
+                put(col, r0, horizontal, kind != FRAME)
+                put(col, r1, horizontal, kind != FRAME)
+            for row in range(r0 + 1, r1):
+                put(c0, row, vertical, True)
+                put(c1, row, vertical, True)
+                if kind != FRAME:
+                    for col in range(c0 + 1, c1):
+                        put(col, row, ' ', True)
+            for (col, row), ch in zip(((c0, r0), (c1, r0), (c0, r1), (c1, r1)), corners):
+                put(col, row, ch, True)
+        elif kind in _TEXT_ATTRS:
+            text = lay.strings[lay.ref[i]]
+            if kind == LABEL:
+                # Sobre el borde superior del marco
+                col, row = cell(x0[i], y0[i] - 12)
+            else:
+                col, row = cell(x0[i] - (len(text) - 1) * CELL_W / 2, y0[i] - 5)
+            for k, ch in enumerate(text):
+                put(col + k, row, ch, True)
+        elif kind == CIRCLE:
+            col, row = cell(x0[i], y0[i])
+            put(col, row, 'o', True)
+    lines = [''.join(line).rstrip() for line in grid]
+    while lines and not lines[-1]:
+        lines.pop()
+    start = 0
+    while start < len(lines) and not lines[start]:
+        start += 1
+    for line in lines[start:]:
+        out(line + '\n')
+
+SERIALIZERS = {
+    'svg': write_svg,
+    'json': write_json,
+    'txt': write_text,
+}
+
+def render(diagram, fmt='svg', **options):
+    """Diagrama serializado en el formato pedido, a partir de su layout en caché"""
+    buf = []
+    SERIALIZERS[fmt](layout(diagram), buf.append, **options)
+    return ''.join(buf)
+
+def main(argv=None):
+    import argparse
+    from generate_diagrams import diagrams, get_diagram
+
+    parser = argparse.ArgumentParser(description="Maqueta diagramas y los serializa en varios formatos")
+    parser.add_argument('rules', nargs='*', help="reglas a mostrar (por defecto, todas)")
+    parser.add_argument('--format', choices=sorted(SERIALIZERS), default='txt')
+    parser.add_argument('--grammar', metavar='ARCHIVO',
+                        help="usar una gramática BNF en lugar de las funciones d_*")
+    args = parser.parse_args(argv)
+
+    rules = diagrams
+    if args.grammar:
+        from bnf import load_grammar, compile_grammar
+        rules = compile_grammar(load_grammar(args.grammar))
+    unknown = [name for name in args.rules if name not in rules]
+    if unknown:
+        parser.error(f"reglas desconocidas: {', '.join(unknown)}")
+    for name in args.rules or rules:
+        if args.format == 'txt':
+            sys.stdout.write(f'{name}:\n')
+        sys.stdout.write(render(get_diagram(rules[name]), args.format))
+        sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
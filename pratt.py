@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Analizador de expresiones por precedencia (precedence climbing)
+Lee la tabla de precedencia y asociatividad del final de
+grammar_bminor_plus.txt y analiza las expresiones con un único bucle en
+lugar de una función por nivel (expr1 ... expr9): un literal ya no cuesta
+diez llamadas anidadas.
+
+Los árboles son tuplas:
+
+    ('ID', 'x')  ('INTEGER_LITERAL', '3')  ...     hojas (tipo de token, texto)
+    ('group', e)                                   '(' expr ')'
+    ('call', nombre, args)  ('new', nombre, args)  llamadas y new
+    ('index', nombre, e)                           'ID' index
+    ('member', e, nombre)                          expr9 '.' 'ID'
+    ('postfix', op, e)  ('prefix', op, e)          ++ -- y unarios
+    ('binary', op, izq, der)
+    ('ternary', cond, si, no)
+    ('assign', op, lval, e)
+
+    python3 pratt.py "a = b + c * -d ? x.y : f(1, 2)"
+    python3 pratt.py --check 2000       # comparar con el análisis nivel a nivel
+    python3 pratt.py --bench            # velocidad y profundidad de pila
+"""
+
+import random
+import re
+import sys
+import time
+
+from bnf import TOKEN_LABELS, load_grammar
+from lexer import KIND, KINDS, OPERATORS, tokenize
+
+class ParseError(ValueError):
+    pass
+
+# ============================================================
+# TABLA DE PRECEDENCIA
+# ============================================================
+
+# Símbolo de la tabla -> nombre del terminal ('||' -> 'LOR')
+_SYMBOLS = {label: name for name, label in TOKEN_LABELS.items()}
+
+_ROW = re.compile(r"^\s*(\d+)\s*\|(.*)\|\s*(Izquierda|Derecha)\s*\|\s*(\w+)\s*$", re.M)
+
+class Level:
+    """Una fila de la tabla: nivel, forma ('assign', 'ternary', 'binary',
+    'prefix' o 'postfix'), terminales, asociatividad y regla"""
+    __slots__ = ('level', 'form', 'ops', 'right', 'rule')
+
+    def __init__(self, level, form, ops, right, rule):
+        self.level = level
+        self.form = form
+        self.ops = ops
+        self.right = right
+        self.rule = rule
+
+    def __repr__(self):
+        return f"Level({self.level}, {self.form!r}, {self.ops!r}, right={self.right}, rule={self.rule!r})"
+
+def precedence_table(text):
+    """Filas de la tabla 'Nivel | Operadores | Asociatividad | Regla' del texto
+    de la gramática, de menor a mayor precedencia"""
+    levels = []
+    for m in _ROW.finditer(text):
+        words = m.group(2).split()
+        notes = [w for w in words if w.startswith('(') and w.endswith(')') and w not in ('()',)]
+        symbols = [w for w in words if w not in notes]
+        if '?:' in symbols:
+            form, ops = 'ternary', ('?',)
+        elif '(unarios)' in notes:
+            form, ops = 'prefix', tuple(_SYMBOLS.get(s, s) for s in symbols)
+        elif '(postfix)' in notes:
+            # () y [] solo siguen a un ID (regla group); aquí quedan ++ -- .
+            form = 'postfix'
+            ops = tuple(_SYMBOLS.get(s, s) for s in symbols if s not in ('()', '[]'))
+        elif '=' in symbols:
+            form, ops = 'assign', tuple(symbols)
+        else:
+            form, ops = 'binary', tuple(_SYMBOLS.get(s, s) for s in symbols)
+        unknown = [op for op in ops if op not in KIND]
+        if unknown:
+            raise ValueError(f"nivel {m.group(1)}: operadores desconocidos {' '.join(unknown)}")
+        levels.append(Level(int(m.group(1)), form, ops, m.group(3) == 'Derecha', m.group(4)))
+    if not levels:
+        raise ValueError("no se encontró la tabla de precedencia")
+    levels.sort(key=lambda lv: lv.level)
+    return levels
+
+def load_precedence(path='grammar_bminor_plus.txt'):
+    with open(path, encoding='utf-8') as f:
+        return precedence_table(f.read())
+
+# ============================================================
+# ANALIZADOR
+# ============================================================
+
+def _is_lval(tree):
+    """lval ::= 'ID' | 'ID' index | lval '.' 'ID'"""
+    while tree[0] == 'member':
+        tree = tree[1]
+    return tree[0] == 'ID' or tree[0] == 'index'
+
+_ID = KIND['ID']
+_LITERALS = frozenset(KIND[k] for k in ('INTEGER_LITERAL', 'FLOAT_LITERAL', 'CHAR_LITERAL',
+                                        'STRING_LITERAL', 'TRUE', 'FALSE'))
+_LPAREN, _RPAREN = KIND['('], KIND[')']
+_LBRACKET, _RBRACKET = KIND['['], KIND[']']
+_COMMA, _COLON, _DOT = KIND[','], KIND[':'], KIND['.']
+_NEW, _EOF = KIND['NEW'], KIND['EOF']
+
+class Cursor:
+    """Posición sobre los tokens del lexer y el texto fuente. Para analizar
+    muchas expresiones de un mismo archivo se crea una vez y se pasa a
+    ExprParser.expression."""
+    __slots__ = ('kinds', 'spans', 'source', 'pos')
+
+    def __init__(self, tokens, source, pos=0):
+        self.kinds = [k for k, _, _ in tokens]
+        self.spans = tokens
+        self.source = source
+        self.pos = pos
+
+    def text(self, i):
+        _, start, end = self.spans[i]
+        return self.source[start:end].decode('utf-8')
+
+    def expect(self, kind):
+        if self.kinds[self.pos] != kind:
+            raise self.error(f"se esperaba '{KINDS[kind]}'")
+        self.pos += 1
+
+    def error(self, msg):
+        found = KINDS[self.kinds[self.pos]]
+        return ParseError(f"token {self.pos} ({found}): {msg}")
+
+class ExprParser:
+    """Analizador de expresiones guiado por la tabla de precedencia"""
+    __slots__ = ('binary', 'prefix', 'postfix', 'assign_prec', 'ternary_prec', 'unary_prec')
+
+    def __init__(self, levels):
+        # terminal -> (precedencia, precedencia mínima del operando derecho)
+        self.binary = {}
+        self.prefix = frozenset()
+        self.postfix = frozenset()
+        self.assign_prec = self.ternary_prec = self.unary_prec = None
+        for lv in levels:
+            ops = [KIND[op] for op in lv.ops]
+            if lv.form == 'prefix':
+                self.prefix = frozenset(ops)
+                self.unary_prec = lv.level
+            elif lv.form == 'postfix':
+                self.postfix = frozenset(ops)
+            else:
+                if lv.form == 'assign':
+                    self.assign_prec = lv.level
+                elif lv.form == 'ternary':
+                    self.ternary_prec = lv.level
+                for op in ops:
+                    self.binary[op] = (lv.level, lv.level if lv.right else lv.level + 1)
+
+    def parse(self, tokens, source, pos=0):
+        """Árbol de la expresión que empieza en tokens[pos] y posición del
+        primer token que no forma parte de ella"""
+        cur = Cursor(tokens, source, pos)
+        return self.expression(cur), cur.pos
+
+    def expression(self, cur):
+        """Árbol de la expresión en la posición del cursor, que avanza tras ella"""
+        return self._expr(cur, 0)
+
+    def _expr(self, cur, min_prec):
+        kinds = cur.kinds
+        binary = self.binary
+        left = self._unary(cur)
+        while True:
+            op = kinds[cur.pos]
+            info = binary.get(op)
+            if info is None or info[0] < min_prec:
+                return left
+            prec, next_prec = info
+            cur.pos += 1
+            if prec == self.ternary_prec:
+                yes = self._expr(cur, prec)
+                cur.expect(_COLON)
+                left = ('ternary', left, yes, self._expr(cur, prec))
+            elif prec == self.assign_prec:
+                if not _is_lval(left):
+                    cur.pos -= 1
+                    raise cur.error("la parte izquierda de la asignación no es un lval")
+                left = ('assign', KINDS[op], left, self._expr(cur, next_prec))
+            else:
+                left = ('binary', KINDS[op], left, self._expr(cur, next_prec))
+
+    def _unary(self, cur):
+        """expr8: unarios prefijos y luego expr9, sin recursión"""
+        kinds = cur.kinds
+        i = cur.pos
+        kind = kinds[i]
+        # Caso más frecuente: un ID o literal suelto
+        if kind == _ID or kind in _LITERALS:
+            nxt = kinds[i + 1]
+            if nxt not in self.postfix and nxt != _LPAREN and nxt != _LBRACKET:
+                cur.pos = i + 1
+                return (KINDS[kind], cur.text(i))
+        ops = []
+        while kinds[cur.pos] in self.prefix:
+            ops.append(KINDS[kinds[cur.pos]])
+            cur.pos += 1
+        tree = self._group(cur)
+        postfix = self.postfix
+        while kinds[cur.pos] in postfix:
+            op = kinds[cur.pos]
+            cur.pos += 1
+            if op == _DOT:
+                if kinds[cur.pos] != _ID:
+                    raise cur.error("se esperaba un ID tras '.'")
+                tree = ('member', tree, cur.text(cur.pos))
+                cur.pos += 1
+            else:
+                tree = ('postfix', KINDS[op], tree)
+        for op in reversed(ops):
+            tree = ('prefix', op, tree)
+        return tree
+
+    def _group(self, cur):
+        kinds = cur.kinds
+        i = cur.pos
+        kind = kinds[i]
+        if kind == _ID:
+            cur.pos = i + 1
+            name = cur.text(i)
+            nxt = kinds[i + 1]
+            if nxt == _LPAREN:
+                return ('call', name, self._args(cur))
+            if nxt == _LBRACKET:
+                cur.pos += 1
+                index = self._expr(cur, 0)
+                cur.expect(_RBRACKET)
+                return ('index', name, index)
+            return ('ID', name)
+        if kind in _LITERALS:
+            cur.pos = i + 1
+            return (KINDS[kind], cur.text(i))
+        if kind == _LPAREN:
+            cur.pos = i + 1
+            tree = self._expr(cur, 0)
+            cur.expect(_RPAREN)
+            return ('group', tree)
+        if kind == _NEW:
+            cur.pos = i + 1
+            if kinds[cur.pos] != _ID:
+                raise cur.error("se esperaba un ID tras 'new'")
+            name = cur.text(cur.pos)
+            cur.pos += 1
+            if kinds[cur.pos] != _LPAREN:
+                raise cur.error("se esperaba '(' tras 'new ID'")
+            return ('new', name, self._args(cur))
+        raise cur.error("se esperaba una expresión")
+
+    def _args(self, cur):
+        """'(' opt_expr_list ')' con el cursor en '('"""
+        cur.pos += 1
+        args = []
+        if cur.kinds[cur.pos] != _RPAREN:
+            args.append(self._expr(cur, 0))
+            while cur.kinds[cur.pos] == _COMMA:
+                cur.pos += 1
+                args.append(self._expr(cur, 0))
+        cur.expect(_RPAREN)
+        return tuple(args)
+
+def parse_expression(source, parser=None):
+    """Árbol de una expresión completa (str o bytes)"""
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    parser = parser or ExprParser(load_precedence())
+    tokens = list(tokenize(source))
+    tree, pos = parser.parse(tokens, source)
+    if tokens[pos][0] != _EOF:
+        raise Cursor(tokens, source, pos).error("sobra texto tras la expresión")
+    return tree
+
+# ============================================================
+# REFERENCIA: UNA FUNCIÓN POR REGLA
+# ============================================================
+
+class ChainParser:
+    """Descenso recursivo que sigue literalmente la cadena expr1 -> expr9 y
+    group de la gramática, sin usar la tabla ni compartir código con
+    ExprParser. Sirve para comprobar que el analizador por precedencia da
+    los mismos árboles y para medirlo."""
+    __slots__ = ()
+
+    _ASSIGN = frozenset(KIND[op] for op in ('=', '+=', '-=', '*=', '/='))
+    _CHAIN = [frozenset(KIND[op] for op in ops) for ops in (
+        ('LOR',), ('LAND',), ('EQ', 'NE', 'LT', 'LE', 'GT', 'GE'),
+        ('+', '-'), ('*', '/', '%'), ('^',))]
+    _PREFIX = frozenset(KIND[op] for op in ('-', 'NOT', 'INC', 'DEC'))
+    _POSTFIX = frozenset(KIND[op] for op in ('INC', 'DEC', '.'))
+    _FACTOR = frozenset(KIND[kind] for kind in (
+        'ID', 'INTEGER_LITERAL', 'FLOAT_LITERAL', 'CHAR_LITERAL', 'STRING_LITERAL', 'TRUE', 'FALSE'))
+
+    def parse(self, tokens, source, pos=0):
+        cur = Cursor(tokens, source, pos)
+        return self.expression(cur), cur.pos
+
+    def expression(self, cur):
+        return self._expr1(cur)
+
+    def _expr1(self, cur):
+        left = self._expr1_5(cur)
+        op = cur.kinds[cur.pos]
+        if op in self._ASSIGN:
+            if not _is_lval(left):
+                raise cur.error("la parte izquierda de la asignación no es un lval")
+            cur.pos += 1
+            return ('assign', KINDS[op], left, self._expr1(cur))
+        return left
+
+    def _expr1_5(self, cur):
+        cond = self._level(cur, 0)
+        if cur.kinds[cur.pos] != KIND['?']:
+            return cond
+        cur.pos += 1
+        yes = self._expr1_5(cur)
+        cur.expect(_COLON)
+        return ('ternary', cond, yes, self._expr1_5(cur))
+
+    def _level(self, cur, n):
+        """expr2 ... expr7: una llamada por nivel, asociativos a la izquierda"""
+        if n == len(self._CHAIN):
+            return self._expr8(cur)
+        left = self._level(cur, n + 1)
+        ops = self._CHAIN[n]
+        while cur.kinds[cur.pos] in ops:
+            op = KINDS[cur.kinds[cur.pos]]
+            cur.pos += 1
+            left = ('binary', op, left, self._level(cur, n + 1))
+        return left
+
+    def _expr8(self, cur):
+        op = cur.kinds[cur.pos]
+        if op in self._PREFIX:
+            cur.pos += 1
+            return ('prefix', KINDS[op], self._expr8(cur))
+        return self._expr9(cur)
+
+    def _expr9(self, cur):
+        tree = self._group(cur)
+        while cur.kinds[cur.pos] in self._POSTFIX:
+            op = cur.kinds[cur.pos]
+            cur.pos += 1
+            if op == _DOT:
+                if cur.kinds[cur.pos] != _ID:
+                    raise cur.error("se esperaba un ID tras '.'")
+                tree = ('member', tree, cur.text(cur.pos))
+                cur.pos += 1
+            else:
+                tree = ('postfix', KINDS[op], tree)
+        return tree
+
+    def _group(self, cur):
+        """group ::= ( expr ) | ID ( opt_expr_list ) | NEW ID ( opt_expr_list ) | ID index | factor"""
+        kinds = cur.kinds
+        kind = kinds[cur.pos]
+        if kind == _LPAREN:
+            cur.pos += 1
+            tree = self._expr1(cur)
+            cur.expect(_RPAREN)
+            return ('group', tree)
+        if kind == _NEW:
+            cur.pos += 1
+            if kinds[cur.pos] != _ID:
+                raise cur.error("se esperaba un ID tras 'new'")
+            name = cur.text(cur.pos)
+            cur.pos += 1
+            if kinds[cur.pos] != _LPAREN:
+                raise cur.error("se esperaba '(' tras 'new ID'")
+            return ('new', name, self._call_args(cur))
+        if kind == _ID and kinds[cur.pos + 1] == _LPAREN:
+            name = cur.text(cur.pos)
+            cur.pos += 1
+            return ('call', name, self._call_args(cur))
+        if kind == _ID and kinds[cur.pos + 1] == _LBRACKET:
+            name = cur.text(cur.pos)
+            cur.pos += 1
+            return ('index', name, self._index(cur))
+        return self._factor(cur)
+
+    def _index(self, cur):
+        """index ::= [ expr ]"""
+        cur.expect(_LBRACKET)
+        tree = self._expr1(cur)
+        cur.expect(_RBRACKET)
+        return tree
+
+    def _call_args(self, cur):
+        """( opt_expr_list ), con expr_list ::= expr | expr , expr_list"""
+        cur.expect(_LPAREN)
+        args = []
+        if cur.kinds[cur.pos] != _RPAREN:
+            args.append(self._expr1(cur))
+            while cur.kinds[cur.pos] == _COMMA:
+                cur.pos += 1
+                args.append(self._expr1(cur))
+        cur.expect(_RPAREN)
+        return tuple(args)
+
+    def _factor(self, cur):
+        kind = cur.kinds[cur.pos]
+        if kind not in self._FACTOR:
+            raise cur.error("se esperaba una expresión")
+        cur.pos += 1
+        return (KINDS[kind], cur.text(cur.pos - 1))
+
+# ============================================================
+# COMPROBACIÓN Y BENCHMARK
+# ============================================================
+
+# Texto de ejemplo para cada terminal en las expresiones aleatorias
+_SAMPLE_TEXT = {'ID': 'x', 'INTEGER_LITERAL': '7', 'FLOAT_LITERAL': '2.5',
+                'CHAR_LITERAL': "'c'", 'STRING_LITERAL': '"s"'}
+_SAMPLE_TEXT.update((KINDS[k], text.decode()) for text, k in OPERATORS.items())
+_SAMPLE_TEXT.update((name, name.lower()) for name in KINDS if name.isalpha() and name not in _SAMPLE_TEXT)
+
+def random_expression(grammar, rng, budget=40):
+    """Texto de una expresión derivada al azar desde 'expr' según la
+    gramática; al agotarse el presupuesto se toma la alternativa más corta"""
+    out = []
+    stack = ['expr']
+    while stack:
+        symbol = stack.pop()
+        if grammar.is_terminal(symbol):
+            out.append(_SAMPLE_TEXT[symbol])
+            continue
+        alts = grammar.rules[symbol]
+        if budget > 0:
+            alt = rng.choice(alts)
+            budget -= len(alt)
+        else:
+            alt = min(alts, key=lambda a: (sum(s in grammar.rules for s in a), len(a)))
+        stack.extend(reversed(alt))
+    return ' '.join(out)
+
+def _max_depth(fn):
+    """Profundidad máxima de la pila de Python durante fn()"""
+    depth = 0
+    deepest = 0
+
+    def profile(frame, event, arg):
+        nonlocal depth, deepest
+        if event == 'call':
+            depth += 1
+            deepest = max(deepest, depth)
+        elif event == 'return':
+            depth -= 1
+
+    sys.setprofile(profile)
+    try:
+        fn()
+    finally:
+        sys.setprofile(None)
+    return deepest
+
+def check(count, grammar_path='grammar_bminor_plus.txt', seed=0):
+    """Compara ambos analizadores sobre expresiones aleatorias; devuelve las diferencias"""
+    grammar = load_grammar(grammar_path)
+    fast = ExprParser(load_precedence(grammar_path))
+    slow = ChainParser()
+    rng = random.Random(seed)
+    problems = []
+    for _ in range(count):
+        text = random_expression(grammar, rng)
+        try:
+            a = parse_expression(text, fast)
+        except ParseError as e:
+            a = f"error: {e}"
+        b = parse_expression(text, slow)
+        if a != b:
+            problems.append(text)
+    return problems
+
+def _flat_expression(rng, operands):
+    """Operandos sueltos unidos por operadores binarios al azar: el caso en
+    que la cadena expr1 -> expr9 más pesa"""
+    ops = ['+', '-', '*', '/', '%', '^', '<', '==', '&&', '||']
+    parts = ['x']
+    for i in range(operands - 1):
+        parts.append(rng.choice(ops))
+        parts.append(rng.choice(('x', 'y', '7', '2.5')))
+    return ' '.join(parts)
+
+def bench(grammar_path='grammar_bminor_plus.txt', repeat=3):
+    grammar = load_grammar(grammar_path)
+    rng = random.Random(1)
+    corpora = {
+        'aleatorias': '; '.join(random_expression(grammar, rng, 60) for _ in range(3000)),
+        'aritméticas': '; '.join(_flat_expression(rng, 12) for _ in range(3000)),
+    }
+    semicolon = KIND[';']
+    parsers = (('precedencia', ExprParser(load_precedence(grammar_path))), ('nivel a nivel', ChainParser()))
+
+    def run(parser, tokens, source):
+        cur = Cursor(tokens, source)
+        kinds = cur.kinds
+        while kinds[cur.pos] != _EOF:
+            parser.expression(cur)
+            if kinds[cur.pos] == semicolon:
+                cur.pos += 1
+
+    for corpus, text in corpora.items():
+        source = text.encode()
+        tokens = list(tokenize(source))
+        print(f"  {corpus} ({len(tokens)} tokens)")
+        times = []
+        for name, parser in parsers:
+            best = float('inf')
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                run(parser, tokens, source)
+                best = min(best, time.perf_counter() - t0)
+            times.append(best)
+            print(f"    {name:<14} {len(tokens) / best / 1e6:>5.2f} Mtok/s  {best * 1000:>8.1f} ms")
+        print(f"    precedencia {times[1] / times[0]:.2f}× más rápido")
+
+    literal = list(tokenize(b'x'))
+    for name, parser in parsers:
+        depth = _max_depth(lambda: parser.parse(literal, b'x'))
+        print(f"  {name:<14} pila para un literal: {depth} marcos")
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analizador de expresiones B-Minor+ por precedencia")
+    parser.add_argument('expr', nargs='?', help="expresión a analizar")
+    parser.add_argument('--grammar', default='grammar_bminor_plus.txt',
+                        help="gramática con la tabla de precedencia")
+    parser.add_argument('--check', type=int, metavar='N',
+                        help="comparar con el análisis nivel a nivel en N expresiones aleatorias")
+    parser.add_argument('--bench', action='store_true', help="medir velocidad y profundidad de pila")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems = check(args.check, args.grammar)
+        if problems:
+            print(f"❌ {len(problems)} expresiones con árboles distintos:")
+            for text in problems[:10]:
+                print(f"  {text}")
+            return 1
+        print(f"✅ {args.check} expresiones: mismos árboles que la gramática")
+        return 0
+    if args.bench:
+        print("Benchmark de expresiones")
+        bench(args.grammar)
+        return 0
+    if not args.expr:
+        parser.error("indica una expresión, --check o --bench")
+    try:
+        print(parse_expression(args.expr, ExprParser(load_precedence(args.grammar))))
+    except (ParseError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
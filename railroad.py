@@ -3,15 +3,90 @@ Simple Railroad Diagram Generator
 Genera diagramas de sintaxis en formato SVG para gramáticas BNF
 """
 
-class Component:
+import hashlib
+import html
+import weakref
+
+# Versión del formato de salida: incrementarla cada vez que cambie el SVG
+# generado, para que las cachés de diagramas ya renderizados se invaliden.
+RENDERER_VERSION = 3
+
+# Nodos ya construidos, indexados por (clase, argumentos). Los hijos de un
+# nodo compuesto también están internados, así que subárboles idénticos
+# comparten una única instancia (hash-consing). Cada clase define __reduce__
+# con sus argumentos para que pickle también pase por esta tabla.
+_interned = weakref.WeakValueDictionary()
+
+class _Interned(type):
+    """Metaclase: devuelve la instancia compartida para (clase, argumentos)"""
+    def __call__(cls, *args):
+        key = (cls, args)
+        node = _interned.get(key)
+        if node is None:
+            node = super().__call__(*args)
+            node._digest = _node_digest(cls, args)
+            node._frozen = True
+            _interned[key] = node
+        return node
+
+def _node_digest(cls, args):
+    """Huella del subárbol a partir de la de sus hijos (ya calculada)"""
+    h = hashlib.blake2b(cls.__name__.encode(), digest_size=16)
+    for arg in args:
+        if isinstance(arg, Component):
+            h.update(b'c')
+            h.update(arg._digest)
+        else:
+            data = str(arg).encode()
+            h.update(b's%d:' % len(data))
+            h.update(data)
+    return h.digest()
+
+class Component(metaclass=_Interned):
+    __slots__ = ('width', 'height', '_digest', '_frozen', '__weakref__')
+
     def __init__(self):
         self.width = 0
         self.height = 0
         
+    def __setattr__(self, name, value):
+        # Los nodos se comparten entre diagramas: no se pueden modificar
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"{type(self).__name__} es inmutable")
+        object.__setattr__(self, name, value)
+        
+    # Las hojas (Terminal, NonTerminal) se escriben directamente
+    _leaf = False
+
+    def write_svg(self, out, x, y, ctx=None):
+        """Escribe el SVG del componente llamando a out(fragmento).
+        El árbol se recorre con una pila explícita, no con recursión: _steps()
+        escribe las líneas propias de cada nodo y cede (hijo, x, y) cuando toca
+        dibujar un hijo, así que la profundidad solo la limita la memoria."""
+        stack = [self._steps(out, x, y, ctx)]
+        while stack:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                continue
+            child, child_x, child_y = step
+            if child._leaf:
+                child.write_svg(out, child_x, child_y, ctx)
+            else:
+                stack.append(child._steps(out, child_x, child_y, ctx))
+
+    def _steps(self, out, x, y, ctx):
+        return iter(())
+
     def to_svg(self, x, y):
-        return ""
+        buf = []
+        self.write_svg(buf.append, x, y)
+        return "".join(buf)
 
 class Terminal(Component):
+    __slots__ = ('text',)
+    _leaf = True
+
     def __init__(self, text):
         super().__init__()
         self.text = text
@@ -19,15 +94,31 @@ class Terminal(Component):
         self.width = len(text) * 8 + padding * 2
         self.height = 30
         
-    def to_svg(self, x, y):
+    def __reduce__(self):
+        return (type(self), (self.text,))
+
+    def write_svg(self, out, x, y, ctx=None):
+        if ctx is not None and ctx.symbols is not None:
+            ctx.use(out, self, x, y)
+        else:
+            self.write_box(out, x, y, ctx)
+
+    def write_box(self, out, x, y, ctx=None):
+        if ctx is not None and ctx.minify:
+            n = ctx.num
+            out(f'<rect class="t" x="{n(x)}" y="{n(y)}" width="{n(self.width)}" height="{n(self.height)}" rx="10"/>'
+                f'<text x="{n(x + self.width/2)}" y="{n(y + self.height/2 + 5)}">{html.escape(self.text, quote=False)}</text>')
+            return
         rx = 10
-        svg = f'<rect x="{x}" y="{y}" width="{self.width}" height="{self.height}" '
-        svg += f'rx="{rx}" ry="{rx}" fill="#90EE90" stroke="#000" stroke-width="2"/>\n'
-        svg += f'<text x="{x + self.width/2}" y="{y + self.height/2 + 5}" '
-        svg += f'text-anchor="middle" font-family="monospace" font-size="14" font-weight="bold">{self.text}</text>\n'
-        return svg
+        out(f'<rect x="{x}" y="{y}" width="{self.width}" height="{self.height}" '
+            f'rx="{rx}" ry="{rx}" fill="#90EE90" stroke="#000" stroke-width="2"/>\n'
+            f'<text x="{x + self.width/2}" y="{y + self.height/2 + 5}" '
+            f'text-anchor="middle" font-family="monospace" font-size="14" font-weight="bold">{html.escape(self.text, quote=False)}</text>\n')
 
 class NonTerminal(Component):
+    __slots__ = ('text',)
+    _leaf = True
+
     def __init__(self, text):
         super().__init__()
         self.text = text
@@ -35,46 +126,85 @@ class NonTerminal(Component):
         self.width = len(text) * 8 + padding * 2
         self.height = 30
         
-    def to_svg(self, x, y):
-        svg = f'<rect x="{x}" y="{y}" width="{self.width}" height="{self.height}" '
-        svg += f'fill="#87CEEB" stroke="#000" stroke-width="2"/>\n'
-        svg += f'<text x="{x + self.width/2}" y="{y + self.height/2 + 5}" '
-        svg += f'text-anchor="middle" font-family="monospace" font-size="14">{self.text}</text>\n'
-        return svg
+    def __reduce__(self):
+        return (type(self), (self.text,))
+
+    def write_svg(self, out, x, y, ctx=None):
+        # Enlace a la regla, si el contexto tiene destino para ella
+        href = ctx.links.get(self.text) if ctx is not None and ctx.links is not None else None
+        if href is not None:
+            nl = '' if ctx.minify else '\n'
+            out(f'<a href="{html.escape(href)}" target="_top">{nl}')
+        if ctx is not None and ctx.symbols is not None:
+            ctx.use(out, self, x, y)
+        else:
+            self.write_box(out, x, y, ctx)
+        if href is not None:
+            out(f'</a>{nl}')
+
+    def write_box(self, out, x, y, ctx=None):
+        if ctx is not None and ctx.minify:
+            n = ctx.num
+            out(f'<rect class="n" x="{n(x)}" y="{n(y)}" width="{n(self.width)}" height="{n(self.height)}"/>'
+                f'<text x="{n(x + self.width/2)}" y="{n(y + self.height/2 + 5)}">{html.escape(self.text, quote=False)}</text>')
+            return
+        out(f'<rect x="{x}" y="{y}" width="{self.width}" height="{self.height}" '
+            f'fill="#87CEEB" stroke="#000" stroke-width="2"/>\n'
+            f'<text x="{x + self.width/2}" y="{y + self.height/2 + 5}" '
+            f'text-anchor="middle" font-family="monospace" font-size="14">{html.escape(self.text, quote=False)}</text>\n')
+
+# Conectores. En modo minify no se escriben al momento: se acumulan en el
+# contexto y se emiten como un único <path> al final del diagrama.
+def _line(out, ctx, x1, y1, x2, y2, fill=''):
+    if ctx is not None and ctx.minify:
+        ctx.path('M', x1, y1, 'L', x2, y2)
+    else:
+        out(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="#000" stroke-width="2"{fill}/>\n')
+
+def _path(out, ctx, *d):
+    if ctx is not None and ctx.minify:
+        ctx.path(*d)
+    else:
+        out(f'<path d="{" ".join(map(str, d))}" stroke="#000" stroke-width="2" fill="none"/>\n')
 
 class Sequence(Component):
+    __slots__ = ('items',)
+
     def __init__(self, *items):
         super().__init__()
         self.items = items
         self.width = sum(item.width for item in items) + (len(items) - 1) * 20
         self.height = max(item.height for item in items) if items else 30
         
-    def to_svg(self, x, y):
-        svg = ""
+    def __reduce__(self):
+        return (type(self), self.items)
+
+    def _steps(self, out, x, y, ctx):
         current_x = x
         for i, item in enumerate(self.items):
             y_offset = y + (self.height - item.height) / 2
-            svg += item.to_svg(current_x, y_offset)
+            yield item, current_x, y_offset
             current_x += item.width
             
             # Línea de conexión
             if i < len(self.items) - 1:
                 y_mid = y + self.height / 2
-                svg += f'<line x1="{current_x}" y1="{y_mid}" x2="{current_x + 20}" y2="{y_mid}" '
-                svg += f'stroke="#000" stroke-width="2"/>\n'
+                _line(out, ctx, current_x, y_mid, current_x + 20, y_mid)
                 current_x += 20
-        
-        return svg
 
 class Choice(Component):
+    __slots__ = ('items',)
+
     def __init__(self, *items):
         super().__init__()
         self.items = items
         self.width = max(item.width for item in items) + 100
         self.height = sum(item.height for item in items) + (len(items) - 1) * 20 + 20
         
-    def to_svg(self, x, y):
-        svg = ""
+    def __reduce__(self):
+        return (type(self), self.items)
+
+    def _steps(self, out, x, y, ctx):
         current_y = y + 10
         
         for i, item in enumerate(self.items):
@@ -82,84 +212,147 @@ class Choice(Component):
             item_x = x + (self.width - item.width) / 2
             
             # Dibujar el item
-            svg += item.to_svg(item_x, current_y)
+            yield item, item_x, current_y
             
             # Líneas de entrada
             if i == 0:
                 # Primera opción - línea directa
-                svg += f'<line x1="{x}" y1="{y + self.height/2}" x2="{item_x}" y2="{current_y + item.height/2}" '
-                svg += f'stroke="#000" stroke-width="2" fill="none"/>\n'
+                _line(out, ctx, x, y + self.height/2, item_x, current_y + item.height/2, ' fill="none"')
             else:
                 # Otras opciones - curva desde arriba
-                svg += f'<path d="M {x} {y + self.height/2} Q {x + 20} {current_y + item.height/2} {item_x} {current_y + item.height/2}" '
-                svg += f'stroke="#000" stroke-width="2" fill="none"/>\n'
+                _path(out, ctx, 'M', x, y + self.height/2, 'Q', x + 20, current_y + item.height/2, item_x, current_y + item.height/2)
             
             # Líneas de salida
-            svg += f'<line x1="{item_x + item.width}" y1="{current_y + item.height/2}" '
-            svg += f'x2="{x + self.width}" y2="{y + self.height/2}" '
-            svg += f'stroke="#000" stroke-width="2" fill="none"/>\n'
+            _line(out, ctx, item_x + item.width, current_y + item.height/2, x + self.width, y + self.height/2, ' fill="none"')
             
             current_y += item.height + 20
-        
-        return svg
 
 class Optional(Component):
+    __slots__ = ('item',)
+
     def __init__(self, item):
         super().__init__()
         self.item = item
         self.width = item.width + 100
         self.height = item.height + 40
         
-    def to_svg(self, x, y):
-        svg = ""
+    def __reduce__(self):
+        return (type(self), (self.item,))
+
+    def _steps(self, out, x, y, ctx):
         item_x = x + 50
         item_y = y + 20
         
         # Dibujar item
-        svg += self.item.to_svg(item_x, item_y)
+        yield self.item, item_x, item_y
         
         # Línea que pasa por el item
         y_mid = item_y + self.item.height / 2
-        svg += f'<line x1="{x}" y1="{y_mid}" x2="{item_x}" y2="{y_mid}" stroke="#000" stroke-width="2"/>\n'
-        svg += f'<line x1="{item_x + self.item.width}" y1="{y_mid}" x2="{x + self.width}" y2="{y_mid}" stroke="#000" stroke-width="2"/>\n'
+        _line(out, ctx, x, y_mid, item_x, y_mid)
+        _line(out, ctx, item_x + self.item.width, y_mid, x + self.width, y_mid)
         
         # Línea que evita el item (arriba)
-        svg += f'<path d="M {x} {y_mid} Q {x + 25} {y} {x + 50} {y} L {item_x + self.item.width - 50} {y} Q {item_x + self.item.width - 25} {y} {item_x + self.item.width} {y_mid}" '
-        svg += f'stroke="#000" stroke-width="2" fill="none"/>\n'
-        
-        return svg
+        end_x = item_x + self.item.width
+        _path(out, ctx, 'M', x, y_mid, 'Q', x + 25, y, x + 50, y, 'L', end_x - 50, y, 'Q', end_x - 25, y, end_x, y_mid)
 
 class ZeroOrMore(Component):
+    __slots__ = ('item',)
+
     def __init__(self, item):
         super().__init__()
         self.item = item
         self.width = item.width + 100
         self.height = item.height + 60
         
-    def to_svg(self, x, y):
-        svg = ""
+    def __reduce__(self):
+        return (type(self), (self.item,))
+
+    def _steps(self, out, x, y, ctx):
         item_x = x + 50
         item_y = y + 30
         
         # Dibujar item
-        svg += self.item.to_svg(item_x, item_y)
+        yield self.item, item_x, item_y
         
         # Línea principal
         y_mid = item_y + self.item.height / 2
-        svg += f'<line x1="{x}" y1="{y_mid}" x2="{item_x}" y2="{y_mid}" stroke="#000" stroke-width="2"/>\n'
-        svg += f'<line x1="{item_x + self.item.width}" y1="{y_mid}" x2="{x + self.width}" y2="{y_mid}" stroke="#000" stroke-width="2"/>\n'
+        _line(out, ctx, x, y_mid, item_x, y_mid)
+        _line(out, ctx, item_x + self.item.width, y_mid, x + self.width, y_mid)
         
         # Línea de bypass (arriba)
-        svg += f'<path d="M {x} {y_mid} Q {x + 25} {y + 10} {x + 50} {y + 10} L {item_x + self.item.width - 50} {y + 10} Q {item_x + self.item.width - 25} {y + 10} {item_x + self.item.width} {y_mid}" '
-        svg += f'stroke="#000" stroke-width="2" fill="none"/>\n'
+        end_x = item_x + self.item.width
+        _path(out, ctx, 'M', x, y_mid, 'Q', x + 25, y + 10, x + 50, y + 10, 'L', end_x - 50, y + 10, 'Q', end_x - 25, y + 10, end_x, y_mid)
         
         # Línea de repetición (abajo)
-        svg += f'<path d="M {item_x + self.item.width} {y_mid} Q {item_x + self.item.width + 25} {y + self.height - 10} {item_x + self.item.width - 50} {y + self.height - 10} L {x + 50} {y + self.height - 10} Q {x + 25} {y + self.height - 10} {x + 50} {y_mid}" '
-        svg += f'stroke="#000" stroke-width="2" fill="none"/>\n'
-        
-        return svg
+        bottom = y + self.height - 10
+        _path(out, ctx, 'M', end_x, y_mid, 'Q', end_x + 25, bottom, end_x - 50, bottom, 'L', x + 50, bottom, 'Q', x + 25, bottom, x + 50, y_mid)
+
+class Inlined(Component):
+    """Regla expandida dentro de otro diagrama: su árbol dentro de un marco
+    discontinuo con el nombre de la regla. Con un SvgContext se escribe una
+    sola vez por documento (<symbol>) y cada aparición es un <use>, así que
+    una regla expandida en muchos sitios no se vuelve a serializar."""
+    __slots__ = ('name', 'item')
+    _leaf = True
+
+    def __init__(self, name, item):
+        super().__init__()
+        self.name = name
+        self.item = item
+        self.width = max(item.width, len(name) * 7 + 10) + 40
+        self.height = item.height + 40
+
+    def __reduce__(self):
+        return (type(self), (self.name, self.item))
+
+    def write_svg(self, out, x, y, ctx=None):
+        if ctx is not None:
+            ctx.share(out, self, x, y)
+        else:
+            self.write_frame(out, x, y)
+
+    def write_frame(self, out, x, y, ctx=None):
+        """Marco, nombre y árbol de la regla; las reglas anidadas quedan como <use>"""
+        name = html.escape(self.name, quote=False)
+        if ctx is not None and ctx.minify:
+            # Los atributos perderían frente a las reglas rect/text de la hoja
+            # de estilos: el marco y el nombre llevan sus propias clases
+            n = ctx.num
+            out(f'<rect class="f" x="{n(x + 10)}" y="{n(y + 2)}" width="{n(self.width - 20)}" '
+                f'height="{n(self.height - 4)}" rx="6"/>'
+                f'<text class="l" x="{n(x + 15)}" y="{n(y + 14)}">{name}</text>')
+        else:
+            out(f'<rect x="{x + 10}" y="{y + 2}" width="{self.width - 20}" height="{self.height - 4}" '
+                f'rx="6" fill="none" stroke="#888" stroke-width="1" stroke-dasharray="4 3"/>\n'
+                f'<text x="{x + 15}" y="{y + 14}" font-size="11" text-anchor="start" '
+                f'fill="#555">{name}</text>\n')
+        item_x = x + (self.width - self.item.width) / 2
+        item_y = y + 20
+        y_mid = item_y + self.item.height / 2
+        _line(out, ctx, x, y_mid, item_x, y_mid)
+        self.item.write_svg(out, item_x, item_y, ctx)
+        _line(out, ctx, item_x + self.item.width, y_mid, x + self.width, y_mid)
+
+# Estilos compartidos del modo minify: sustituyen a los atributos repetidos
+_MINIFY_STYLE = ('<style>text{font:14px monospace;text-anchor:middle}'
+                 'rect{stroke:#000;stroke-width:2}.t{fill:#90EE90}.n{fill:#87CEEB}.t+text{font-weight:bold}'
+                 'path{stroke:#000;stroke-width:2;fill:none}'
+                 '.f{fill:none;stroke:#888;stroke-width:1;stroke-dasharray:4 3}'
+                 '.l{font-size:11px;text-anchor:start;fill:#555}</style>')
+
+def _write_header(out, width, height, ctx):
+    if ctx is not None and ctx.minify:
+        out(f'<svg width="{ctx.num(width)}" height="{ctx.num(height)}" xmlns="http://www.w3.org/2000/svg">'
+            f'{_MINIFY_STYLE}')
+    else:
+        out(f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">\n'
+            '<style>\n'
+            'text { font-family: monospace; }\n'
+            '</style>\n')
 
 class Diagram:
+    __slots__ = ('root', 'width', 'height')
+
     def __init__(self, *items):
         if len(items) == 1:
             self.root = items[0]
@@ -169,30 +362,199 @@ class Diagram:
         self.width = self.root.width + 60
         self.height = self.root.height + 40
         
-    def to_svg(self):
-        svg = f'<svg width="{self.width}" height="{self.height}" xmlns="http://www.w3.org/2000/svg">\n'
-        svg += '<style>\n'
-        svg += 'text { font-family: monospace; }\n'
-        svg += '</style>\n'
+    def __reduce__(self):
+        # El árbol se serializa aplanado en postorden (índices en lugar de
+        # hijos anidados) para que pickle no dependa de la profundidad
+        index = {}
+        nodes = []
+        stack = [self.root]
+        while stack:
+            node = stack[-1]
+            if node in index:
+                stack.pop()
+                continue
+            cls, args = node.__reduce__()
+            pending = [arg for arg in args if isinstance(arg, Component) and arg not in index]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            index[node] = len(nodes)
+            nodes.append((cls, tuple(index[arg] if isinstance(arg, Component) else arg for arg in args)))
+        return (_unflatten, (nodes,))
+
+    def digest(self):
+        """Huella del árbol de componentes y de la versión del renderizador"""
+        h = hashlib.blake2b(b'%d:' % RENDERER_VERSION, digest_size=16)
+        h.update(self.root._digest)
+        return h.hexdigest()
+        
+    def write_svg(self, out, ctx=None):
+        """Escribe el documento SVG completo por fragmentos (out: file.write, list.append...)"""
+        if ctx is None:
+            ctx = SvgContext()
+        _write_header(out, self.width, self.height, ctx)
+        self.write_content(out, ctx)
+        ctx.write_defs(out)
+        out('</svg>')
+        
+    def write_content(self, out, ctx=None):
+        """Cuerpo del diagrama, sin la etiqueta <svg>, con origen en (0, 0)"""
+        minify = ctx is not None and ctx.minify
         
         # Línea de entrada
         y_mid = 20 + self.root.height / 2
-        svg += f'<circle cx="10" cy="{y_mid}" r="5" fill="#000"/>\n'
-        svg += f'<line x1="10" y1="{y_mid}" x2="30" y2="{y_mid}" stroke="#000" stroke-width="2"/>\n'
+        if minify:
+            out(f'<circle cx="10" cy="{ctx.num(y_mid)}" r="5"/>')
+        else:
+            out(f'<circle cx="10" cy="{y_mid}" r="5" fill="#000"/>\n')
+        _line(out, ctx, 10, y_mid, 30, y_mid)
         
         # Diagrama principal
-        svg += self.root.to_svg(30, 20)
+        self.root.write_svg(out, 30, 20, ctx)
         
         # Línea de salida
-        svg += f'<line x1="{30 + self.root.width}" y1="{y_mid}" x2="{self.width - 10}" y2="{y_mid}" stroke="#000" stroke-width="2"/>\n'
-        svg += f'<circle cx="{self.width - 10}" cy="{y_mid}" r="5" fill="#000"/>\n'
+        _line(out, ctx, 30 + self.root.width, y_mid, self.width - 10, y_mid)
+        if minify:
+            out(f'<circle cx="{ctx.num(self.width - 10)}" cy="{ctx.num(y_mid)}" r="5"/>')
+            ctx.write_path(out)
+        else:
+            out(f'<circle cx="{self.width - 10}" cy="{y_mid}" r="5" fill="#000"/>\n')
         
-        svg += '</svg>'
-        return svg
+    def to_svg(self, minify=False, links=None):
+        buf = []
+        self.write_svg(buf.append, SvgContext(minify=minify, links=links))
+        return "".join(buf)
     
-    def save(self, filename):
+    def save(self, filename, minify=False, links=None):
+        # Se escribe directamente al archivo, sin construir el documento en memoria
         with open(filename, 'w') as f:
-            f.write(self.to_svg())
+            self.write_svg(f.write, SvgContext(minify=minify, links=links))
+
+def _unflatten(nodes):
+    built = []
+    for cls, args in nodes:
+        built.append(cls(*(built[arg] if isinstance(arg, int) else arg for arg in args)))
+    return Diagram(built[-1])
+
+class SvgContext:
+    """Estado compartido mientras se escribe un documento SVG.
+    - symbols: cada Terminal/NonTerminal distinto se define una sola vez como
+      <symbol> y cada aparición es un <use>
+    - minify: estilos en clases CSS, coordenadas con 'precision' decimales
+      y todos los conectores de un diagrama en un solo <path>
+    - links: {regla: href}; cada NonTerminal con destino queda dentro de un <a>
+    Las reglas expandidas (Inlined) se escriben siempre una sola vez."""
+    __slots__ = ('symbols', 'minify', 'precision', 'links', 'shared', '_shared_order', '_segments', '_pen')
+
+    def __init__(self, symbols=False, minify=False, precision=2, links=None):
+        self.symbols = {} if symbols else None
+        self.links = links
+        self.shared = {}
+        self._shared_order = []
+        self.minify = minify
+        self.precision = precision
+        self._segments = []
+        self._pen = None
+
+    def num(self, value):
+        """Número con precisión fija y sin ceros sobrantes: 35.0 -> 35"""
+        text = f'{value:.{self.precision}f}'
+        if '.' in text:
+            text = text.rstrip('0').rstrip('.')
+        return '0' if text == '-0' else text
+
+    def path(self, *d):
+        """Añade comandos al trazo acumulado; omite el 'M' si el lápiz ya está ahí"""
+        n = self.num
+        segments = self._segments
+        i = 0
+        while i < len(d):
+            cmd = d[i]
+            if cmd == 'Q':
+                segments.append(f'Q{n(d[i + 1])} {n(d[i + 2])} {n(d[i + 3])} {n(d[i + 4])}')
+                self._pen = (d[i + 3], d[i + 4])
+                i += 5
+                continue
+            x, y = d[i + 1], d[i + 2]
+            if cmd == 'M':
+                if self._pen != (x, y):
+                    segments.append(f'M{n(x)} {n(y)}')
+            elif self._pen is not None and self._pen[1] == y:
+                segments.append(f'H{n(x)}')
+            elif self._pen is not None and self._pen[0] == x:
+                segments.append(f'V{n(y)}')
+            else:
+                segments.append(f'L{n(x)} {n(y)}')
+            self._pen = (x, y)
+            i += 3
+
+    def write_path(self, out):
+        if self._segments:
+            out(f'<path d="{"".join(self._segments)}"/>')
+        self._segments = []
+        self._pen = None
+
+    def use(self, out, node, x, y):
+        symbol_id = self.symbols.get(node)
+        if symbol_id is None:
+            symbol_id = self.symbols[node] = f's-{len(self.symbols)}'
+        if self.minify:
+            out(f'<use href="#{symbol_id}" x="{self.num(x)}" y="{self.num(y)}"/>')
+        else:
+            out(f'<use href="#{symbol_id}" x="{x}" y="{y}"/>\n')
+
+    def share(self, out, node, x, y):
+        """<use> de una regla expandida; su definición se escribe en write_defs"""
+        ref = self.shared.get(node)
+        if ref is None:
+            ref = self.shared[node] = f'i-{len(self.shared)}'
+            self._shared_order.append(node)
+        if self.minify:
+            out(f'<use href="#{ref}" x="{self.num(x)}" y="{self.num(y)}"/>')
+        else:
+            out(f'<use href="#{ref}" x="{x}" y="{y}"/>\n')
+
+    def write_defs(self, out):
+        if not self.symbols and not self.shared:
+            return
+        nl = '' if self.minify else '\n'
+        out(f'<defs>{nl}')
+        # Una regla expandida puede dar de alta otras (y nuevas cajas) al
+        # escribirse: se recorren por orden de alta hasta agotarlas
+        i = 0
+        while i < len(self._shared_order):
+            node = self._shared_order[i]
+            out(f'<symbol id="{self.shared[node]}" overflow="visible">{nl}')
+            node.write_frame(out, 0, 0, self)
+            if self.minify:
+                self.write_path(out)
+            out(f'</symbol>{nl}')
+            i += 1
+        for node, symbol_id in (self.symbols or {}).items():
+            out(f'<symbol id="{symbol_id}" overflow="visible">{nl}')
+            node.write_box(out, 0, 0, self)
+            out(f'</symbol>{nl}')
+        out(f'</defs>{nl}')
+
+def write_atlas(out, diagrams, gap=20, minify=False, links=None):
+    """Escribe varios diagramas [(nombre, Diagram)] en un único SVG.
+    Cada regla se puede mostrar sola con atlas.svg#nombre (elemento <view>)."""
+    diagrams = list(diagrams)
+    width = max((d.width for _, d in diagrams), default=0)
+    height = sum(d.height for _, d in diagrams) + gap * max(len(diagrams) - 1, 0)
+    ctx = SvgContext(symbols=True, minify=minify, links=links)
+    _write_header(out, width, height, ctx)
+    nl = '' if minify else '\n'
+    y = 0
+    for name, diagram in diagrams:
+        out(f'<view id="{name}" viewBox="0 {y} {diagram.width} {diagram.height}"/>{nl}'
+            f'<g id="rule-{name}" transform="translate(0 {y})">{nl}')
+        diagram.write_content(out, ctx)
+        out(f'</g>{nl}')
+        y += diagram.height + gap
+    ctx.write_defs(out)
+    out('</svg>')
 
 # Funciones de ayuda
 def T(text):
@@ -218,3 +580,7 @@ def Opt(item):
 def ZM(item):
     """Zero or More"""
     return ZeroOrMore(item)
+
+def I(name, item):
+    """Inlined"""
+    return Inlined(name, item)
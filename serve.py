@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Servidor local de vista previa
+Sirve el atlas HTML y renderiza /svg/<regla>.svg la primera vez que se pide,
+a partir del registro 'diagrams' de generate_diagrams.py (o de una gramática
+BNF). Solo librería estándar (asyncio).
+
+- Los SVG se guardan en una caché LRU limitada en bytes, indexada por la
+  huella del árbol de la regla: dos reglas idénticas comparten entrada y un
+  cambio de contenido nunca sirve una versión vieja.
+- La huella es también el ETag: If-None-Match responde 304 sin renderizar.
+- Varias peticiones simultáneas de una regla que aún no está en caché
+  esperan a un único renderizado.
+- /stats devuelve contadores de aciertos, fallos y latencia en JSON.
+
+    python3 serve.py                       # http://127.0.0.1:8000/
+    python3 serve.py --grammar grammar_bminor_plus.txt --port 8080
+"""
+
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from urllib.parse import unquote, urlsplit
+
+from generate_diagrams import diagrams, factor_rules, get_diagram, index_html, inline_rules, render_svg
+
+# Segundos que una conexión keep-alive puede quedar inactiva
+KEEPALIVE = 15
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class LRUCache:
+    """Caché LRU limitada por el tamaño total de los valores (bytes)"""
+    __slots__ = ('max_bytes', 'size', 'evictions', '_items')
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+class Stats:
+    """Contadores del servidor y latencia de las últimas peticiones"""
+    __slots__ = ('started', 'requests', 'hits', 'misses', 'coalesced', 'not_modified',
+                 'render_ms', '_latency')
+
+    def __init__(self, window=1000):
+        self.started = time.time()
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.render_ms = 0.0
+        self._latency = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.requests += 1
+        self._latency.append(seconds * 1000)
+
+    def snapshot(self, cache):
+        latency = sorted(self._latency)
+
+        def pct(p):
+            return round(latency[min(len(latency) - 1, int(p * len(latency)))], 3) if latency else 0
+
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'not_modified': self.not_modified,
+            'render_ms': round(self.render_ms, 3),
+            'cache': {'entries': len(cache), 'bytes': cache.size,
+                      'max_bytes': cache.max_bytes, 'evictions': cache.evictions},
+            'latency_ms': {'p50': pct(0.50), 'p95': pct(0.95), 'max': pct(1.0),
+                           'window': len(latency)},
+        }
+
+def _etag_matches(header, etag):
+    """If-None-Match: lista de ETags (débiles o no) o '*'"""
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+class PreviewServer:
+    """Rutas: / (atlas HTML), /svg/<regla>.svg y /stats"""
+
+    def __init__(self, rules, minify=False, cache_bytes=16 << 20):
+        self.rules = rules
+        self.minify = minify
+        self.page = None            # atlas HTML, generado en la primera visita
+        # Las cajas NonTerminal enlazan con el atlas, así que el SVG depende
+        # también de qué reglas existen: entra en la clave de caché y el ETag
+        self.links = {name: f'../index.html#rule-{name}' for name in rules}
+        variant = hashlib.blake2b('\n'.join(sorted(rules)).encode(), digest_size=4).hexdigest()
+        self._variant = variant + ('-min' if minify else '')
+        self.cache = LRUCache(cache_bytes)
+        self.stats = Stats()
+        self._diagrams = {}         # regla -> Diagram ya construido
+        self._inflight = {}         # huella -> Future del renderizado en curso
+
+    # --------------------------------------------------------
+    # Rutas
+    # --------------------------------------------------------
+
+    async def respond(self, method, target, headers):
+        """(estado, cabeceras, cuerpo) de una petición"""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        path = unquote(urlsplit(target).path)
+        if path in ('/', '/index.html'):
+            return self._page()
+        if path == '/stats':
+            body = json.dumps(self.stats.snapshot(self.cache), indent=1).encode()
+            return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, body
+        if path.startswith('/svg/') and path.endswith('.svg'):
+            return await self._svg(path[5:-4], headers)
+        return 404, {'Content-Type': 'text/plain; charset=utf-8'}, b'no encontrado\n'
+
+    def _page(self):
+        if self.page is None:
+            self.page = index_html(self.rules).encode()
+        return 200, {'Content-Type': 'text/html; charset=utf-8', 'Cache-Control': 'no-cache'}, self.page
+
+    async def _svg(self, name, headers):
+        rule = self.rules.get(name)
+        if rule is None:
+            return 404, {'Content-Type': 'text/plain; charset=utf-8'}, b'regla desconocida\n'
+        diagram = self._diagrams.get(name)
+        if diagram is None:
+            diagram = self._diagrams[name] = get_diagram(rule)
+        key = f'{diagram.digest()}-{self._variant}'
+        etag = f'"{key}"'
+        cache_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if _etag_matches(headers.get('if-none-match', ''), etag):
+            self.stats.not_modified += 1
+            return 304, cache_headers, b''
+
+        body = self.cache.get(key)
+        if body is not None:
+            self.stats.hits += 1
+        else:
+            body = await self._render(key, diagram)
+        return 200, {'Content-Type': 'image/svg+xml', **cache_headers}, body
+
+    async def _render(self, key, diagram):
+        """Renderiza fuera del bucle de eventos; las peticiones simultáneas de
+        la misma huella esperan al mismo Future"""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats.coalesced += 1
+            return await pending
+        self.stats.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        t0 = time.perf_counter()
+        try:
+            body = await loop.run_in_executor(None, render_svg, diagram, self.minify, self.links)
+        except Exception as e:
+            future.set_exception(e)
+            # Si nadie más espera, se marca la excepción como recuperada
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        self.stats.render_ms += (time.perf_counter() - t0) * 1000
+        self.cache.put(key, body)
+        future.set_result(body)
+        return body
+
+    # --------------------------------------------------------
+    # HTTP/1.1
+    # --------------------------------------------------------
+
+    async def handle(self, reader, writer):
+        """Una conexión: peticiones en serie mientras siga abierta (keep-alive)"""
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                t0 = time.perf_counter()
+                parts = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = header.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+                    await self._write(writer, 'HEAD', 400, {}, b'', keep=False)
+                    break
+                method, target, version = parts
+                try:
+                    status, extra, body = await self.respond(method, target, headers)
+                except Exception as e:
+                    print(f"❌ {method} {target}: {type(e).__name__}: {e}", file=sys.stderr)
+                    status, extra, body = 500, {'Content-Type': 'text/plain; charset=utf-8'}, b'error\n'
+                connection = headers.get('connection', '').lower()
+                keep = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                await self._write(writer, method, status, extra, body, keep)
+                self.stats.record(time.perf_counter() - t0)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write(self, writer, method, status, headers, body, keep):
+        head = [f'HTTP/1.1 {status} {_REASONS[status]}']
+        head.extend(f'{k}: {v}' for k, v in headers.items())
+        head.append(f'Content-Length: {len(body)}')
+        head.append('Connection: keep-alive' if keep else 'Connection: close')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        if method != 'HEAD' and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+async def serve(server, host='127.0.0.1', port=8000):
+    listener = await asyncio.start_server(server.handle, host, port)
+    addresses = ', '.join(f'http://{s.getsockname()[0]}:{s.getsockname()[1]}/' for s in listener.sockets)
+    print(f"🌐 Vista previa en {addresses} ({len(server.rules)} reglas; estadísticas en /stats)")
+    async with listener:
+        await listener.serve_forever()
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor de vista previa de los railroad diagrams")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--grammar', metavar='ARCHIVO',
+                        help="usar una gramática BNF en lugar de las funciones d_*")
+    parser.add_argument('--inline', type=int, nargs='?', const=2, metavar='NIVELES',
+                        help="expandir las referencias a otras reglas (ver generate_diagrams.py)")
+    parser.add_argument('--factor', action='store_true',
+                        help="factorizar las alternativas antes de dibujar (ver generate_diagrams.py)")
+    parser.add_argument('--minify', action='store_true', help="servir SVG compactos")
+    parser.add_argument('--cache-mb', type=float, default=16,
+                        help="tamaño máximo de la caché de SVG en MB (por defecto 16)")
+    args = parser.parse_args(argv)
+
+    rules = diagrams
+    if args.grammar:
+        from bnf import load_grammar, compile_grammar
+        rules = compile_grammar(load_grammar(args.grammar))
+    if args.factor:
+        rules = factor_rules(rules)
+    if args.inline:
+        rules = inline_rules(rules, args.inline)
+    server = PreviewServer(rules, args.minify, int(args.cache_mb * (1 << 20)))
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Servidor detenido")
+
+if __name__ == '__main__':
+    main()
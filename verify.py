@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""
+Verificador de diagramas contra la gramática
+Convierte cada diagrama (Seq/Ch/Opt/ZM sobre símbolos) y las alternativas de
+su regla en grammar_bminor_plus.txt en autómatas finitos sobre secuencias de
+símbolos, los determiniza y minimiza y comprueba si aceptan lo mismo. Si no,
+muestra el contraejemplo más corto de cada lado.
+
+- La recursión izquierda y derecha de una regla (A ::= x A | A y | b) se
+  traduce en bucles: x* b y*, tanto en la gramática como en un diagrama
+  que nombra su propia regla. La recursión en medio (A ::= x A y) no es
+  regular y la regla se omite.
+- Las reglas auxiliares de la gramática sin diagrama propio (if_cond,
+  opt_expr...) se sustituyen por su lenguaje en ambos lados, así que un
+  diagrama que las dibuja en línea no cuenta como diferencia.
+
+    python3 verify.py                     # todas las reglas con diagrama
+    python3 verify.py expr8 if_stmt_open  # solo algunas
+    python3 verify.py --check             # casos de ejemplo del propio verificador
+"""
+
+import sys
+import time
+from collections import deque
+
+from bnf import TOKEN_LABELS, load_grammar
+from railroad import Choice, Component, Inlined, NonTerminal, Optional, Sequence, Terminal, ZeroOrMore
+
+EPSILON_LABEL = 'ε'
+
+# Expresiones regulares sobre símbolos, como tuplas:
+#   ('sym', símbolo)     símbolo = ('t', etiqueta) o ('n', regla)
+#   ('eps',)             la secuencia vacía
+#   ('none',)            ninguna secuencia
+#   ('seq', partes)  ('alt', partes)  ('star', parte)
+EPS = ('eps',)
+NONE = ('none',)
+
+class NotRegular(ValueError):
+    pass
+
+# ============================================================
+# EXPRESIONES REGULARES
+# ============================================================
+
+def diagram_regex(root):
+    """Expresión regular del árbol de componentes (postorden con pila explícita)"""
+    memo = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        if isinstance(node, Terminal):
+            memo[node] = EPS if node.text == EPSILON_LABEL else ('sym', ('t', node.text))
+        elif isinstance(node, NonTerminal):
+            memo[node] = ('sym', ('n', node.text))
+        elif isinstance(node, Inlined):
+            memo[node] = ('sym', ('n', node.name))
+        else:
+            children = [arg for arg in node.__reduce__()[1] if isinstance(arg, Component)]
+            pending = [child for child in children if child not in memo]
+            if pending:
+                stack.extend(pending)
+                continue
+            parts = tuple(memo[child] for child in children)
+            if isinstance(node, Sequence):
+                memo[node] = ('seq', parts)
+            elif isinstance(node, Choice):
+                memo[node] = ('alt', parts)
+            elif isinstance(node, Optional):
+                memo[node] = ('alt', parts + (EPS,))
+            elif isinstance(node, ZeroOrMore):
+                memo[node] = ('star', parts[0])
+            else:
+                raise TypeError(f"componente no soportado: {type(node).__name__}")
+        stack.pop()
+    return memo[root]
+
+def _symbol(grammar, symbol):
+    if grammar.is_terminal(symbol):
+        return ('sym', ('t', TOKEN_LABELS.get(symbol, symbol)))
+    return ('sym', ('n', symbol))
+
+def _union(alts):
+    options = tuple(('seq', alt) if alt else EPS for alt in alts)
+    return ('alt', options) if options else NONE
+
+def _loops(name, alts):
+    """Lenguaje de A ::= alts (tuplas de expresiones) con la recursión
+    izquierda y derecha de A convertida en bucles (lema de Arden): R* B L*
+    para A ::= r A | A l | b"""
+    own = ('sym', ('n', name))
+    base, left, right = [], [], []
+    for alt in alts:
+        if alt == (own,):
+            # A ::= A no aporta nada al lenguaje
+            continue
+        mentions = _mentioning(alt, own)
+        if not mentions:
+            base.append(alt)
+        elif alt[0] == own and mentions == {alt[0]} and own not in alt[1:]:
+            left.append(alt[1:])
+        elif alt[-1] == own and mentions == {alt[-1]} and own not in alt[:-1]:
+            right.append(alt[:-1])
+        else:
+            raise NotRegular(f"'{name}' tiene recursión en medio de una alternativa")
+    parts = [_union(base)]
+    if right:
+        parts.insert(0, ('star', _union(right)))
+    if left:
+        parts.append(('star', _union(left)))
+    return ('seq', tuple(parts)) if len(parts) > 1 else parts[0]
+
+def _mentioning(regexes, own):
+    """Subexpresiones de 'regexes' que contienen el símbolo 'own' (postorden
+    iterativo)"""
+    memo = {}
+    stack = list(regexes)
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        kind = node[0]
+        if kind in ('sym', 'eps', 'none'):
+            memo[node] = node == own
+        else:
+            children = node[1] if kind != 'star' else (node[1],)
+            pending = [child for child in children if child not in memo]
+            if pending:
+                stack.extend(pending)
+                continue
+            memo[node] = any(memo[child] for child in children)
+        stack.pop()
+    return {node for node, found in memo.items() if found}
+
+def rule_regex(grammar, name):
+    """Lenguaje de una regla en un nivel: R* B L* para A ::= r A | A l | b"""
+    return _loops(name, [tuple(_symbol(grammar, s) for s in alt) for alt in grammar.rules[name]])
+
+def self_loops(name, regex):
+    """La expresión de un diagrama que nombra su propia regla, con esas
+    referencias convertidas en bucles igual que en rule_regex. Solo se
+    despliegan en alternativas las partes que contienen la referencia."""
+    own = ('sym', ('n', name))
+    mentions = _mentioning((regex,), own)
+    if not mentions:
+        return regex
+
+    def split(node):
+        if node not in mentions:
+            return [] if node == NONE else [()] if node == EPS else [(node,)]
+        kind = node[0]
+        if kind == 'sym':
+            return [(node,)]
+        if kind == 'alt':
+            return [alt for part in node[1] for alt in split(part)]
+        if kind == 'seq':
+            alts = [()]
+            for part in node[1]:
+                alts = [alt + rest for alt in alts for rest in split(part)]
+            return alts
+        raise NotRegular(f"'{name}' se nombra a sí misma dentro de un bucle")
+
+    return _loops(name, split(regex))
+
+def substitute(regex, replace):
+    """Copia de la expresión con cada ('sym', s) cambiado por replace(s) (o
+    igual si devuelve None). Postorden iterativo; subexpresiones compartidas
+    se procesan una vez."""
+    memo = {}
+    stack = [regex]
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        kind = node[0]
+        if kind == 'sym':
+            memo[node] = replace(node[1]) or node
+        elif kind in ('eps', 'none'):
+            memo[node] = node
+        else:
+            children = node[1] if kind != 'star' else (node[1],)
+            pending = [child for child in children if child not in memo]
+            if pending:
+                stack.extend(pending)
+                continue
+            if kind == 'star':
+                memo[node] = ('star', memo[node[1]])
+            else:
+                memo[node] = (kind, tuple(memo[child] for child in children))
+        stack.pop()
+    return memo[regex]
+
+class Expander:
+    """Sustituye las reglas auxiliares (en la gramática pero sin diagrama)
+    por su lenguaje; una auxiliar que se alcanza a sí misma queda como símbolo.
+    La expansión depende de qué auxiliares de su alcance están abiertas en el
+    camino, así que la memoria se indexa por (regla, esas auxiliares)"""
+
+    def __init__(self, grammar, drawn):
+        self.grammar = grammar
+        self.helpers = {name for name in grammar.rules if name not in drawn}
+        self._done = {}
+        self._reach = {}
+        self._active = set()
+
+    def reach(self, name):
+        """Auxiliares alcanzables desde 'name' (incluida ella si es cíclica)"""
+        if name not in self._reach:
+            seen, stack = set(), [name]
+            while stack:
+                for alt in self.grammar.rules[stack.pop()]:
+                    for symbol in alt:
+                        if symbol in self.helpers and symbol not in seen:
+                            seen.add(symbol)
+                            stack.append(symbol)
+            self._reach[name] = frozenset(seen)
+        return self._reach[name]
+
+    def __call__(self, symbol):
+        kind, name = symbol
+        if kind != 'n' or name not in self.helpers or name in self._active:
+            return None
+        key = (name, frozenset(self._active & self.reach(name)))
+        if key not in self._done:
+            self._active.add(name)
+            try:
+                self._done[key] = substitute(rule_regex(self.grammar, name), self)
+            except NotRegular:
+                self._done[key] = None
+            finally:
+                self._active.discard(name)
+        return self._done[key]
+
+# ============================================================
+# AUTÓMATAS
+# ============================================================
+
+class NFA:
+    """Autómata de Thompson: transiciones ε y por símbolo, un estado final"""
+    __slots__ = ('eps', 'moves', 'start', 'final')
+
+    def __init__(self, regex):
+        self.eps = []
+        self.moves = []
+        self.start, self.final = self._build(regex)
+
+    def _state(self):
+        self.eps.append([])
+        self.moves.append({})
+        return len(self.eps) - 1
+
+    def _build(self, regex):
+        # Cada aparición de una subexpresión necesita sus propios estados:
+        # se recorre como árbol, con pila explícita
+        results = []
+        stack = [(regex, False)]
+        while stack:
+            node, ready = stack.pop()
+            kind = node[0]
+            if kind in ('seq', 'alt', 'star') and not ready:
+                stack.append((node, True))
+                children = node[1] if kind != 'star' else (node[1],)
+                stack.extend((child, False) for child in reversed(children))
+                continue
+            start = self._state()
+            final = self._state()
+            if kind == 'sym':
+                self.moves[start].setdefault(node[1], []).append(final)
+            elif kind == 'eps':
+                self.eps[start].append(final)
+            elif kind == 'star':
+                inner_start, inner_final = results.pop()
+                self.eps[start] += [inner_start, final]
+                self.eps[inner_final] += [inner_start, final]
+            elif kind in ('seq', 'alt'):
+                count = len(node[1])
+                parts = results[len(results) - count:]
+                del results[len(results) - count:]
+                if kind == 'alt':
+                    for inner_start, inner_final in parts:
+                        self.eps[start].append(inner_start)
+                        self.eps[inner_final].append(final)
+                else:
+                    current = start
+                    for inner_start, inner_final in parts:
+                        self.eps[current].append(inner_start)
+                        current = inner_final
+                    self.eps[current].append(final)
+            # 'none': sin transiciones, el final es inalcanzable
+            results.append((start, final))
+        return results[0]
+
+    def closure(self, states):
+        seen = set(states)
+        stack = list(states)
+        while stack:
+            for nxt in self.eps[stack.pop()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return frozenset(seen)
+
+class DFA:
+    """Autómata determinista sin estado sumidero explícito: delta[q] es
+    {símbolo: estado}; un símbolo ausente lleva al sumidero"""
+    __slots__ = ('delta', 'accept', 'start')
+
+    def __init__(self, delta, accept, start=0):
+        self.delta = delta
+        self.accept = accept
+        self.start = start
+
+    def __len__(self):
+        return len(self.delta)
+
+    @classmethod
+    def from_nfa(cls, nfa):
+        """Construcción de subconjuntos"""
+        first = nfa.closure([nfa.start])
+        index = {first: 0}
+        subsets = [first]
+        delta = []
+        for subset in subsets:
+            targets = {}
+            for state in subset:
+                for symbol, nxt in nfa.moves[state].items():
+                    targets.setdefault(symbol, set()).update(nxt)
+            row = {}
+            for symbol, states in targets.items():
+                target = nfa.closure(states)
+                if target not in index:
+                    index[target] = len(subsets)
+                    subsets.append(target)
+                row[symbol] = index[target]
+            delta.append(row)
+        return cls(delta, [nfa.final in subset for subset in subsets])
+
+    def minimize(self):
+        """Refinamiento de particiones (Moore); se descartan los estados
+        desde los que no se llega a aceptar"""
+        alive = self._alive()
+        if self.start not in alive:
+            return DFA([{}], [False])
+        states = sorted(alive)
+        alphabet = sorted({symbol for q in states for symbol in self.delta[q]})
+        block = {q: int(self.accept[q]) for q in states}
+        count = len(set(block.values()))
+        while True:
+            signatures = {}
+            refined = {}
+            for q in states:
+                signature = (block[q],) + tuple(block.get(self.delta[q].get(symbol), -1)
+                                                for symbol in alphabet)
+                refined[q] = signatures.setdefault(signature, len(signatures))
+            block = refined
+            if len(signatures) == count:
+                break
+            count = len(signatures)
+        # Numeración en orden de visita desde el inicial
+        order = {block[self.start]: 0}
+        queue = deque([self.start])
+        representative = {0: self.start}
+        while queue:
+            q = queue.popleft()
+            for symbol in sorted(self.delta[q]):
+                nxt = self.delta[q][symbol]
+                if nxt in block and block[nxt] not in order:
+                    order[block[nxt]] = len(order)
+                    representative[order[block[nxt]]] = nxt
+                    queue.append(nxt)
+        delta = []
+        accept = []
+        for i in range(len(order)):
+            q = representative[i]
+            delta.append({symbol: order[block[nxt]] for symbol, nxt in self.delta[q].items() if nxt in block})
+            accept.append(self.accept[q])
+        return DFA(delta, accept)
+
+    def _alive(self):
+        reverse = [[] for _ in self.delta]
+        for q, row in enumerate(self.delta):
+            for nxt in row.values():
+                reverse[nxt].append(q)
+        alive = {q for q, accepting in enumerate(self.accept) if accepting}
+        stack = list(alive)
+        while stack:
+            for prev in reverse[stack.pop()]:
+                if prev not in alive:
+                    alive.add(prev)
+                    stack.append(prev)
+        return alive
+
+def compile_regex(regex):
+    return DFA.from_nfa(NFA(regex)).minimize()
+
+def counterexamples(a, b):
+    """Secuencias más cortas que acepta solo a y solo b (None si no hay).
+    Búsqueda en anchura sobre el producto; None es el sumidero."""
+    alphabet = sorted({symbol for row in a.delta + b.delta for symbol in row})
+    only = [None, None]
+    start = (a.start, b.start)
+    parent = {start: None}
+    queue = deque([start])
+    while queue and (only[0] is None or only[1] is None):
+        pair = queue.popleft()
+        p, q = pair
+        in_a = p is not None and a.accept[p]
+        in_b = q is not None and b.accept[q]
+        if in_a != in_b and only[0 if in_a else 1] is None:
+            word = []
+            node = pair
+            while parent[node] is not None:
+                node, symbol = parent[node]
+                word.append(symbol)
+            only[0 if in_a else 1] = word[::-1]
+        for symbol in alphabet:
+            nxt = (a.delta[p].get(symbol) if p is not None else None,
+                   b.delta[q].get(symbol) if q is not None else None)
+            if nxt != (None, None) and nxt not in parent:
+                parent[nxt] = (pair, symbol)
+                queue.append(nxt)
+    return only[0], only[1]
+
+# ============================================================
+# VERIFICACIÓN
+# ============================================================
+
+def format_word(word):
+    if not word:
+        return 'ε'
+    return ' '.join(f"'{label}'" if kind == 't' else label for kind, label in word)
+
+def verify(rules, grammar, names=None):
+    """Compara cada diagrama con su regla. Devuelve [(regla, resultado)] con
+    resultado = {'status': 'ok' | 'diff' | 'skip', ...}"""
+    from generate_diagrams import get_diagram
+
+    expand = Expander(grammar, rules)
+    results = []
+    for name in names or rules:
+        if name not in grammar.rules:
+            results.append((name, {'status': 'skip', 'reason': 'sin regla en la gramática'}))
+            continue
+        try:
+            expected = substitute(rule_regex(grammar, name), expand)
+        except NotRegular as e:
+            results.append((name, {'status': 'skip', 'reason': str(e)}))
+            continue
+        try:
+            drawn = substitute(self_loops(name, diagram_regex(get_diagram(rules[name]).root)), expand)
+        except NotRegular as e:
+            results.append((name, {'status': 'skip', 'reason': str(e)}))
+            continue
+        a = compile_regex(drawn)
+        b = compile_regex(expected)
+        only_diagram, only_grammar = counterexamples(a, b)
+        result = {'status': 'ok' if only_diagram is None and only_grammar is None else 'diff',
+                  'states': (len(a), len(b))}
+        if only_diagram is not None:
+            result['only_diagram'] = only_diagram
+        if only_grammar is not None:
+            result['only_grammar'] = only_grammar
+        results.append((name, result))
+    return results
+
+# Comprobación: gramática pequeña con recursión izquierda, derecha y de
+# ambos lados, y diagramas que la transcriben tal cual (nombrando su propia
+# regla), con bucles o con un error a propósito
+_CHECK_GRAMMAR = """
+list ::= list ',' item | item
+tail ::= item ';' tail | item
+both ::= '+' both | both '!' | item
+item ::= 'ID' | '(' list ')'
+"""
+
+def check():
+    """[(caso, resultado esperado, obtenido)] de los casos que fallan"""
+    from bnf import parse_grammar
+    from railroad import Diagram, T, N, Seq, Ch, ZM
+
+    grammar = parse_grammar(_CHECK_GRAMMAR)
+    item = Ch(T("ID"), Seq(T("("), N("list"), T(")")))
+    cases = [
+        ('list tal cual', 'list', Ch(Seq(N("list"), T(","), N("item")), N("item")), 'ok'),
+        ('list con bucle', 'list', Seq(N("item"), ZM(Seq(T(","), N("item")))), 'ok'),
+        ('list con otro separador', 'list', Seq(N("item"), ZM(Seq(T(";"), N("item")))), 'diff'),
+        ('tail tal cual', 'tail', Ch(Seq(N("item"), T(";"), N("tail")), N("item")), 'ok'),
+        ('tail con bucle', 'tail', Seq(ZM(Seq(N("item"), T(";"))), N("item")), 'ok'),
+        ('both tal cual', 'both', Ch(Seq(T("+"), N("both")), Seq(N("both"), T("!")), N("item")), 'ok'),
+        ('both sin recursión izquierda', 'both', Ch(Seq(T("+"), N("both")), N("item")), 'diff'),
+        ('item', 'item', item, 'ok'),
+        ('bucle que nombra su regla', 'list', ZM(N("list")), 'skip'),
+    ]
+    problems = []
+    for label, rule, root, expected in cases:
+        (_, result), = verify({rule: Diagram(root)}, grammar)
+        if result['status'] != expected:
+            problems.append((label, expected, result['status']))
+    # dos auxiliares que se alcanzan entre sí: la expansión de una no puede
+    # depender de si la otra se expandió antes
+    helpers = parse_grammar("a ::= 'x' b | 'y'\nb ::= 'z' a | 'w'\n")
+    first, fresh = Expander(helpers, ()), Expander(helpers, ())
+    first(('n', 'a'))
+    if first(('n', 'b')) != fresh(('n', 'b')):
+        problems.append(('auxiliares mutuamente recursivas', 'igual en cualquier orden', 'distinto'))
+    return problems
+
+def main(argv=None):
+    import argparse
+    from generate_diagrams import diagrams
+
+    parser = argparse.ArgumentParser(description="Comprueba que los diagramas d_* describen lo mismo que la gramática")
+    parser.add_argument('rules', nargs='*', help="reglas a comprobar (por defecto, todas las que tienen diagrama)")
+    parser.add_argument('--grammar', default='grammar_bminor_plus.txt', metavar='ARCHIVO')
+    parser.add_argument('-v', '--verbose', action='store_true', help="listar también las reglas equivalentes")
+    parser.add_argument('--check', action='store_true',
+                        help="comprobar el propio verificador con una gramática y diagramas de ejemplo")
+    args = parser.parse_args(argv)
+    if args.check:
+        problems = check()
+        for label, expected, status in problems:
+            print(f"❌ {label}: se esperaba {expected}, resultado {status}")
+        print(f"{'✅' if not problems else '❌'} comprobación del verificador: "
+              f"{len(problems)} casos fallidos")
+        return 1 if problems else 0
+    unknown = [name for name in args.rules if name not in diagrams]
+    if unknown:
+        parser.error(f"reglas sin diagrama: {', '.join(unknown)}")
+
+    grammar = load_grammar(args.grammar)
+    t0 = time.perf_counter()
+    results = verify(diagrams, grammar, args.rules)
+    elapsed = time.perf_counter() - t0
+
+    print(f"Verificando {len(results)} diagramas contra {args.grammar}")
+    counts = {'ok': 0, 'diff': 0, 'skip': 0}
+    for name, result in results:
+        counts[result['status']] += 1
+        if result['status'] == 'skip':
+            print(f"  - {name}: omitida ({result['reason']})")
+        elif result['status'] == 'ok':
+            if args.verbose:
+                print(f"  ✓ {name} ({result['states'][0]} estados)")
+        else:
+            print(f"  ✗ {name} (estados: diagrama {result['states'][0]}, gramática {result['states'][1]})")
+            if 'only_diagram' in result:
+                print(f"      solo en el diagrama:  {format_word(result['only_diagram'])}")
+            if 'only_grammar' in result:
+                print(f"      solo en la gramática: {format_word(result['only_grammar'])}")
+    helpers = len(grammar.rules.keys() - diagrams.keys())
+    print(f"\n{'✅' if not counts['diff'] else '❌'} {counts['ok']} equivalentes, {counts['diff']} distintos, "
+          f"{counts['skip']} omitidos en {elapsed * 1000:.1f} ms "
+          f"({helpers} reglas auxiliares de la gramática expandidas)")
+    return 1 if counts['diff'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())